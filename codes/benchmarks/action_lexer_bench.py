@@ -0,0 +1,116 @@
+"""
+Compares the single-pass action lexer against the previous ast-based path.
+
+Usage:
+    python benchmarks/action_lexer_bench.py [--number 20000]
+"""
+import argparse
+import ast
+import os
+import re
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ui_tars.action_parser import (
+    escape_single_quotes,
+    parse_action,
+    _parse_action_calls,
+)
+
+ACTION_SECTIONS = [
+    "click(start_box='(960,540)')",
+    "left_double(start_box='(100,200)')",
+    "drag(start_box='(300,400)', end_box='(700,400)')",
+    "hotkey(key='ctrl c')",
+    "type(content='It\\'s a \\\"quoted\\\" search query\\n')",
+    "scroll(start_box='(960,540)', direction='down')",
+    "wait()",
+    "finished(content='All done')",
+    "click(start_box='(1,2)')\n\ntype(content='abc')\n\nhotkey(key='enter')",
+]
+
+
+def legacy_parse_action(action_str):
+    """The ast-based parse_action shipped before the lexer."""
+    try:
+        node = ast.parse(action_str, mode='eval')
+        call = node.body
+        if not isinstance(call, ast.Call):
+            raise ValueError("Not a function call")
+        if isinstance(call.func, ast.Name):
+            func_name = call.func.id
+        elif isinstance(call.func, ast.Attribute):
+            func_name = call.func.attr
+        else:
+            func_name = None
+        kwargs = {}
+        for kw in call.keywords:
+            if isinstance(kw.value, ast.Constant):
+                kwargs[kw.arg] = kw.value.value
+            else:
+                kwargs[kw.arg] = None
+        return {'function': func_name, 'args': kwargs}
+    except Exception:
+        return None
+
+
+def legacy_parse_section(action_str):
+    """The split/re.sub/escape/ast pipeline used for the `Action:` section."""
+    all_action = []
+    for action_str in action_str.split(")\n\n"):
+        if "type(content" in action_str:
+            if not action_str.strip().endswith(")"):
+                action_str = action_str.strip() + ")"
+            pattern = r"type\(content='(.*?)'\)"
+            if not re.search(pattern, action_str):
+                raise ValueError("Pattern not found in the input string.")
+            content = re.sub(pattern, lambda m: m.group(1), action_str)
+            action_str = "type(content='" + escape_single_quotes(content) + "')"
+        if not action_str.strip().endswith(")"):
+            action_str = action_str.strip() + ")"
+        all_action.append(action_str)
+    return [
+        legacy_parse_action(action.replace("\n", "\\n").lstrip())
+        for action in all_action
+    ]
+
+
+def lexer_parse_section(action_str):
+    return [call for call, _ in _parse_action_calls(action_str)]
+
+
+def bench(func, number):
+    seconds = timeit.timeit(
+        lambda: [func(section) for section in ACTION_SECTIONS], number=number)
+    return seconds / (number * len(ACTION_SECTIONS)) * 1e6
+
+
+def bench_single(func, action_str, number):
+    return timeit.timeit(lambda: func(action_str), number=number) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    for section in ACTION_SECTIONS:
+        assert lexer_parse_section(section) == legacy_parse_section(section), section
+
+    single = "click(start_box='(960,540)')"
+    rows = [
+        ("parse_action (single call)",
+         bench_single(legacy_parse_action, single, args.number),
+         bench_single(parse_action, single, args.number)),
+        ("Action: section", bench(legacy_parse_section, args.number),
+         bench(lexer_parse_section, args.number)),
+    ]
+    print(f"{'case':<28}{'ast (us)':>12}{'lexer (us)':>12}{'speedup':>10}")
+    for name, legacy, lexer in rows:
+        print(f"{name:<28}{legacy:>12.2f}{lexer:>12.2f}{legacy / lexer:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
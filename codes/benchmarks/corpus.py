@@ -0,0 +1,81 @@
+"""
+Builds a realistic corpus of model responses for the parser benchmarks.
+
+The corpus covers every action form in `ui_tars.prompt`, the canned
+responses of the mock model service, multi-action responses, Reflection /
+Action_Summary headers and `<point>`-style coordinates.
+"""
+import ast
+import os
+import re
+
+from ui_tars import prompt
+
+MOCK_MODEL_SERVICE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "..", "..", "deployment", "model-service",
+                                  "mock_model_service.py")
+
+_ACTION_LINE_RE = re.compile(r"^([a-z_]+\(.*?\))(?:\s*#.*)?$", re.M)
+_PLACEHOLDERS = [
+    ("x1 y1", "235 512"),
+    ("x2 y2", "640 380"),
+    ("down or up or right or left", "down"),
+    ("content='xxx'", "content='It\\'s done: \\\"ok\\\"\\n'"),
+    ("content=''", "content='hello world\\n'"),
+    ("app_name=''", "app_name='Settings'"),
+]
+
+
+def prompt_actions():
+    """Returns every action form from the prompt templates, filled in."""
+    actions = []
+    for template in (prompt.COMPUTER_USE_DOUBAO, prompt.MOBILE_USE_DOUBAO,
+                     prompt.GROUNDING_DOUBAO):
+        action_space = template.split("## Action Space")[1].split("##")[0]
+        for action in _ACTION_LINE_RE.findall(action_space):
+            for placeholder, value in _PLACEHOLDERS:
+                action = action.replace(placeholder, value)
+            # GROUNDING_DOUBAO 的示例多了一个引号
+            action = action.replace("</point>'')", "</point>')")
+            if action not in actions:
+                actions.append(action)
+    return actions
+
+
+def mock_responses():
+    """Returns MOCK_RESPONSES from the mock model service, if it is present."""
+    if not os.path.exists(MOCK_MODEL_SERVICE):
+        return []
+    with open(MOCK_MODEL_SERVICE, encoding="utf-8") as f:
+        module = ast.parse(f.read())
+    for node in module.body:
+        if (isinstance(node, ast.Assign)
+                and any(getattr(t, "id", None) == "MOCK_RESPONSES"
+                        for t in node.targets)):
+            responses = ast.literal_eval(node.value)
+            return [text for texts in responses.values() for text in texts]
+    return []
+
+
+def build_corpus():
+    """Returns a list of full model responses."""
+    actions = prompt_actions()
+    corpus = [
+        f"Thought: I need to perform the next step on the screen.\nAction: {action}"
+        for action in actions
+    ]
+    corpus += [
+        f"Reflection: The previous click did not open the menu.\n"
+        f"Action_Summary: Retry on the menu icon.\nAction: {action}"
+        for action in actions[:4]
+    ]
+    corpus += [f"Action_Summary: Open the menu.\nAction: {actions[0]}"]
+    corpus += [
+        "Thought: Fill in the form and submit it.\nAction: "
+        + "\n\n".join(actions[:6]),
+        "Thought: Select the text then copy it.\nAction: "
+        "drag(start_box='(120,300)', end_box='(480,300)')\n\n"
+        "hotkey(key='ctrl c')\n\nclick(start_box='(900,120)')",
+    ]
+    corpus += mock_responses()
+    return corpus
@@ -0,0 +1,178 @@
+"""
+Parser micro-benchmark suite.
+
+Times parse_action, parse_action_to_structure_output,
+parsing_response_to_pyautogui_code and add_box_token on the corpus from
+`benchmarks/corpus.py`, per call and in bulk, and records ops/sec, the peak
+memory of each call and what a bulk run leaves allocated. Results are written
+to JSON so runs can be compared across commits.
+
+Usage:
+    python benchmarks/parser_suite.py
+    python benchmarks/parser_suite.py --output before.json
+    python benchmarks/parser_suite.py --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+
+from corpus import build_corpus, prompt_actions
+from ui_tars.action_parser import (
+    add_box_token,
+    parse_action,
+    parse_action_to_structure_output,
+    parsing_response_to_pyautogui_code,
+)
+
+SCREEN_HEIGHT, SCREEN_WIDTH = 1080, 1920
+
+
+def build_cases():
+    """Returns {name: (function, inputs)}; each input is an args tuple."""
+    corpus = build_corpus()
+    calls = prompt_actions() + [
+        text.split("Action: ")[-1] for text in corpus
+        if "\n\n" not in text.split("Action: ")[-1]
+    ]
+    structured = [
+        parse_action_to_structure_output(text, 1000, SCREEN_HEIGHT,
+                                         SCREEN_WIDTH) for text in corpus
+    ]
+    return {
+        "parse_action": (parse_action, [(call, ) for call in calls]),
+        "parse_action_to_structure_output":
+        (parse_action_to_structure_output,
+         [(text, 1000, SCREEN_HEIGHT, SCREEN_WIDTH) for text in corpus]),
+        "parsing_response_to_pyautogui_code":
+        (parsing_response_to_pyautogui_code,
+         [(actions, SCREEN_HEIGHT, SCREEN_WIDTH) for actions in structured]),
+        "add_box_token": (add_box_token, [(text, ) for text in corpus]),
+    }
+
+
+def run_bulk(func, inputs):
+    for args in inputs:
+        func(*args)
+
+
+def measure(func, inputs, min_time):
+    """Returns timing and allocation figures for one function."""
+    run_bulk(func, inputs)  # warm caches
+
+    # bulk: calls of the whole corpus, repeated until min_time has elapsed
+    timer = timeit.Timer(lambda: run_bulk(func, inputs))
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    bulk_seconds = min(timer.repeat(repeat=3, number=number)) / number
+
+    # per call: best of three short runs per input, sized from the bulk rate
+    per_input = max(1, int(min_time / bulk_seconds / 3))
+    per_call = []
+    for args in inputs:
+        timer = timeit.Timer(lambda: func(*args))
+        per_call.append(
+            min(timer.repeat(repeat=3, number=per_input)) / per_input)
+    per_call.sort()
+
+    # memory: transient peak of each call on its own, then what a bulk run
+    # leaves allocated (caches) as a snapshot diff
+    tracemalloc.start()
+    peaks = []
+    for args in inputs:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - baseline)
+    peaks.sort()
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    before = tracemalloc.take_snapshot().filter_traces(ignore)
+    run_bulk(func, inputs)
+    after = tracemalloc.take_snapshot().filter_traces(ignore)
+    tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+    return {
+        "inputs": len(inputs),
+        "per_call_us_median": per_call[len(per_call) // 2] * 1e6,
+        "per_call_us_max": per_call[-1] * 1e6,
+        "bulk_ops_per_sec": len(inputs) / bulk_seconds,
+        "peak_alloc_bytes_median": peaks[len(peaks) // 2],
+        "peak_alloc_bytes_max": peaks[-1],
+        "retained_bytes_after_bulk": retained,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=BENCH_DIR,
+                                       stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} ({baseline.get('commit')})")
+    print(f"{'benchmark':<38}{'ops/sec':>14}{'change':>10}")
+    for name, result in results["benchmarks"].items():
+        old = baseline["benchmarks"].get(name)
+        if not old:
+            continue
+        change = result["bulk_ops_per_sec"] / old["bulk_ops_per_sec"] - 1
+        print(f"{name:<38}{result['bulk_ops_per_sec']:>14.0f}{change:>+9.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--output",
+                        help="JSON file to write; defaults to "
+                        "benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", help="previous results JSON to compare")
+    parser.add_argument("--min-time", type=float, default=0.5,
+                        help="minimum seconds per bulk measurement")
+    args = parser.parse_args()
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "benchmarks": {},
+    }
+    print(f"{'benchmark':<38}{'n':>5}{'median us':>12}{'ops/sec':>12}"
+          f"{'peak B med':>12}{'peak B max':>12}")
+    for name, (func, inputs) in build_cases().items():
+        result = measure(func, inputs, args.min_time)
+        results["benchmarks"][name] = result
+        print(f"{name:<38}{result['inputs']:>5}"
+              f"{result['per_call_us_median']:>12.2f}"
+              f"{result['bulk_ops_per_sec']:>12.0f}"
+              f"{result['peak_alloc_bytes_median']:>12.0f}"
+              f"{result['peak_alloc_bytes_max']:>12.0f}")
+
+    output = args.output or os.path.join(
+        BENCH_DIR, "results", f"{results['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
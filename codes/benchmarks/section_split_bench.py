@@ -0,0 +1,82 @@
+"""
+Compares the linear-time Thought/Reflection/Action_Summary splitter against
+the previous lazy-regex extraction on normal and adversarial responses.
+
+Usage:
+    python benchmarks/section_split_bench.py [--size 20000]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ui_tars.action_parser import _split_response
+
+
+def legacy_extract_thought(text):
+    """The regex-based header extraction used before the splitter."""
+    if text.startswith("Thought:"):
+        thought_pattern = r"Thought: (.+?)(?=\s*Action: |$)"
+    elif text.startswith("Reflection:"):
+        thought_pattern = r"Reflection: (.+?)Action_Summary: (.+?)(?=\s*Action: |$)"
+    elif text.startswith("Action_Summary:"):
+        thought_pattern = r"Action_Summary: (.+?)(?=\s*Action: |$)"
+    else:
+        thought_pattern = r"Thought: (.+?)(?=\s*Action: |$)"
+    reflection, thought = None, None
+    thought_match = re.search(thought_pattern, text, re.DOTALL)
+    if thought_match:
+        if len(thought_match.groups()) == 1:
+            thought = thought_match.group(1).strip()
+        elif len(thought_match.groups()) == 2:
+            thought = thought_match.group(2).strip()
+            reflection = thought_match.group(1).strip()
+    return reflection, thought
+
+
+def build_cases(size):
+    return {
+        "normal":
+        "Thought: Click the login button.\nAction: click(start_box='(960,540)')",
+        "long thought, no Action":
+        "Thought: " + "I should look at the screen. " * (size // 28),
+        "whitespace run, no Action":
+        "Thought: x" + " " * size,
+        "Reflection without summary":
+        "Reflection: " + "the previous step failed " * (size // 25),
+        "repeated Reflection markers":
+        "Reflection: " * (size // 12),
+        "repeated Thought markers":
+        "Thought: Thought: " + "Thought: x " * (size // 11),
+    }
+
+
+def bench(func, text, number):
+    return min(timeit.repeat(lambda: func(text), number=number,
+                             repeat=3)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=20000,
+                        help="approximate length of adversarial inputs")
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'case':<30}{'chars':>8}{'regex (us)':>14}{'split (us)':>14}"
+          f"{'speedup':>10}")
+    for name, text in build_cases(args.size).items():
+        assert legacy_extract_thought(text) == _split_response(
+            text, tolerant=True)[:2], name
+        legacy = bench(legacy_extract_thought, text, args.number)
+        split = bench(lambda t: _split_response(t, tolerant=True), text,
+                      args.number)
+        print(f"{name:<30}{len(text):>8}{legacy:>14.1f}{split:>14.1f}"
+              f"{legacy / split:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,10 +5,20 @@ import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from ui_tars import action_parser
 from ui_tars.action_parser import (
+    Action,
     parsing_response_to_pyautogui_code,
     parse_action,
+    parse_actions,
+    parse_actions_batch,
+    StreamingActionParser,
+    get_coordinate_space,
+    get_timing_profile,
+    register_action_handler,
+    registered_action_types,
     parse_action_to_structure_output,
+    MAX_RESPONSE_CHARS,
 )
 
 
@@ -27,11 +37,177 @@ class TestActionParser(unittest.TestCase):
         self.assertEqual(actions[0]['action_type'], 'click')
         self.assertIn('start_box', actions[0]['action_inputs'])
 
+    def test_parse_action_quotes_and_escapes(self):
+        result = parse_action("type(content='it's a \\'test\\'\\n')")
+        self.assertEqual(result['function'], 'type')
+        self.assertEqual(result['args']['content'], "it's a 'test'\n")
+        self.assertIsNone(parse_action("click(start_box='(1,2)') trailing"))
+
+    def test_parse_action_unicode_escapes(self):
+        result = parse_action(
+            r"type(content='caf\u00e9 \xe9 \U0001F600 \N{BULLET} \101\0 \q')")
+        self.assertEqual(result['args']['content'], "café é 😀 • A\0 \\q")
+
+    def test_parse_action_to_structure_output_multiple_actions(self):
+        text = ("Thought: test\nAction: drag(start_point='<point>100 200</point>', "
+                "end_point='<point>300 400</point>')\n\ntype(content='a, b')")
+        actions = parse_action_to_structure_output(
+            text, factor=1000, origin_resized_height=224, origin_resized_width=224,
+            model_type="doubao"
+        )
+        self.assertEqual([a['action_type'] for a in actions], ['drag', 'type'])
+        self.assertEqual(actions[0]['action_inputs']['end_box'], str([0.3, 0.4, 0.3, 0.4]))
+        self.assertEqual(actions[1]['action_inputs']['content'], 'a, b')
+
+    def test_parse_action_to_structure_output_truncated(self):
+        text = "Reflection: r\nAction_Summary: " + "looking " * 1000
+        with self.assertRaises(ValueError):
+            parse_action_to_structure_output(text, 1000, 224, 224)
+        self.assertEqual(
+            parse_action_to_structure_output(text, 1000, 224, 224, tolerant=True), []
+        )
+
+    def test_parse_action_to_structure_output_too_long(self):
+        action = "\nAction: click(start_box='(100,200)')"
+        padding = "x" * (MAX_RESPONSE_CHARS - len("Thought: ") - len(action))
+        text = "Thought: " + padding + action
+        actions = parse_action_to_structure_output(text, 1000, 224, 224)
+        self.assertEqual(actions[0]['action_type'], 'click')
+
+        text = "Thought: " + "x" * 1000 + padding + action
+        with self.assertRaisesRegex(ValueError, f"limit is {MAX_RESPONSE_CHARS}"):
+            parse_action_to_structure_output(text, 1000, 224, 224)
+        # tolerant parsing cuts the text at the limit, which drops the action
+        self.assertEqual(
+            parse_action_to_structure_output(text, 1000, 224, 224, tolerant=True), []
+        )
+
+    def test_parse_actions_typed(self):
+        text = "Thought: test\nAction: click(point='<point>200 300</point>')"
+        actions = parse_actions(
+            text, factor=1000, origin_resized_height=224, origin_resized_width=224,
+            model_type="doubao"
+        )
+        self.assertIsInstance(actions[0], Action)
+        self.assertEqual(actions[0].start_box, (0.2, 0.3, 0.2, 0.3))
+        legacy = parse_action_to_structure_output(
+            text, factor=1000, origin_resized_height=224, origin_resized_width=224,
+            model_type="doubao"
+        )
+        self.assertEqual(actions[0].to_dict(legacy[0]['text']), legacy[0])
+        self.assertEqual(
+            parsing_response_to_pyautogui_code(actions, 224, 224),
+            parsing_response_to_pyautogui_code(legacy, 224, 224),
+        )
+
+    def test_parse_actions_batch(self):
+        texts = [
+            "Thought: a\nAction: click(start_box='(100,200)')",
+            "Thought: no action here",
+            "Thought: b\nAction: hotkey(key='ctrl c')",
+        ]
+        for workers in (1, 2):
+            results, errors = parse_actions_batch(
+                texts, (224, 224), model_type="doubao", workers=workers, chunksize=1
+            )
+            self.assertEqual(results[0][0]['action_type'], 'click')
+            self.assertIsNone(results[1])
+            self.assertIsInstance(errors[1], ValueError)
+            self.assertEqual(results[2][0]['action_inputs'], {'key': 'ctrl c'})
+            self.assertEqual([e is None for e in errors], [True, False, True])
+
+    def test_streaming_action_parser(self):
+        text = ("Thought: test\nAction: click(point='<point>200 300</point>')\n\n"
+                "type(content='a) b')\n\nhotkey(key='enter'")
+        parser = StreamingActionParser(1000, 224, 224, model_type="doubao")
+        events = []
+        for index, char in enumerate(text):
+            for event in parser.feed(char):
+                events.append((index, event))
+        events.extend((len(text), event) for event in parser.close())
+
+        self.assertEqual(events[0], (text.index("Action: ") + 7, ("thought", "test")))
+        self.assertEqual(events[1][0], text.index("')") + 1)
+        self.assertEqual(
+            [payload for _, (kind, payload) in events[1:]],
+            parse_actions(text, 1000, 224, 224, model_type="doubao"),
+        )
+
+    def test_coordinate_space(self):
+        space = get_coordinate_space(1080, 1920)
+        self.assertIs(space, get_coordinate_space(1080, 1920))
+        self.assertEqual((space.resized_height, space.resized_width), (1092, 1932))
+        text = "Thought: test\nAction: click(start_box='(966,546)')"
+        self.assertEqual(
+            parse_action_to_structure_output(text, coordinate_space=space),
+            parse_action_to_structure_output(text, 1000, 1080, 1920),
+        )
+        actions = parse_actions(text, coordinate_space=space)
+        code = parsing_response_to_pyautogui_code(actions, 1080, 1920)
+        self.assertIn("pyautogui.click(960.0, 540.0, button='left')", code)
+
+        hidpi = get_coordinate_space(1080, 1920, scale=2.0, offset_x=1920)
+        code = parsing_response_to_pyautogui_code(actions, coordinate_space=hidpi)
+        self.assertIn("pyautogui.click(2400.0, 270.0, button='left')", code)
+
     def test_parsing_response_to_pyautogui_code(self):
         responses = {"action_type": "hotkey", "action_inputs": {"hotkey": "ctrl v"}}
         code = parsing_response_to_pyautogui_code(responses, 224, 224)
         self.assertIn('pyautogui.hotkey', code)
 
+    def test_parsing_response_to_pyautogui_code_mobile_actions(self):
+        text = ("Thought: test\nAction: long_press(point='<point>500 500</point>')\n\n"
+                "open_app(app_name='Settings')\n\npress_home()\n\npress_back()")
+        actions = parse_actions(text, 1000, 224, 224, model_type="doubao")
+        code = parsing_response_to_pyautogui_code(actions, 224, 224)
+        self.assertIn("pyautogui.mouseDown(112.0, 112.0, button='left')", code)
+        self.assertIn("pyautogui.write('Settings')", code)
+        self.assertIn("pyautogui.press('home')", code)
+        self.assertIn("pyautogui.press('esc')", code)
+        self.assertNotIn("Unrecognized action type", code)
+
+    def test_parsing_response_to_pyautogui_code_timing(self):
+        text = ("Thought: test\nAction: type(content='hi')\n\n"
+                "drag(start_box='(100,100)', end_box='(200,200)')")
+        actions = parse_actions(text, 1000, 224, 224, model_type="doubao")
+        default = parsing_response_to_pyautogui_code(actions, 224, 224, False)
+        self.assertEqual(
+            default,
+            parsing_response_to_pyautogui_code(actions, 224, 224, False,
+                                               timing="conservative"))
+        self.assertIn("interval=0.1)\ntime.sleep(0.5)", default)
+        self.assertIn("duration=1.0)", default)
+
+        code = parsing_response_to_pyautogui_code(actions, 224, 224, False,
+                                                  timing="zero")
+        self.assertNotIn("time.sleep", code)
+        self.assertIn("duration=0)", code)
+
+        code = parsing_response_to_pyautogui_code(
+            actions, 224, 224, False,
+            timing={"profile": "fast", "drag_duration": 0.5})
+        self.assertIn("interval=0.01)\ntime.sleep(0.1)", code)
+        self.assertIn("duration=0.5)", code)
+        self.assertEqual(get_timing_profile("fast").pause, 0.05)
+        with self.assertRaises(ValueError):
+            get_timing_profile("turbo")
+
+    def test_register_action_handler(self):
+        handlers = dict(action_parser._ACTION_HANDLERS)
+        self.addCleanup(action_parser._ACTION_HANDLERS.update, handlers)
+        self.addCleanup(action_parser._ACTION_HANDLERS.clear)
+
+        @register_action_handler("triple_click")
+        def _triple_click(parts, action_type, action_inputs, context):
+            x, y = context.to_screen(action_inputs["start_box"])
+            parts.append(f"\npyautogui.tripleClick({x}, {y})")
+
+        responses = {"action_type": "triple_click",
+                     "action_inputs": {"start_box": "[0.5, 0.5, 0.5, 0.5]"}}
+        code = parsing_response_to_pyautogui_code(responses, 224, 224)
+        self.assertIn("pyautogui.tripleClick(112.0, 112.0)", code)
+        self.assertIn("triple_click", registered_action_types())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+import os
+import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from ui_tars.action_parser import parse_actions
+from ui_tars.coordinates import (
+    model_boxes_to_normalized,
+    normalized_boxes_to_model,
+    normalized_boxes_to_screen,
+    round_like_python,
+)
+
+
+class TestCoordinates(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.dims = [rng.choice([(1080, 1920), (768, 1366), (2160, 3840)])
+                     for _ in range(200)]
+        self.points = [(rng.randint(0, 1000), rng.randint(0, 1000)) for _ in range(200)]
+
+    def test_model_boxes_to_normalized_matches_scalar(self):
+        for model_type in ("qwen25vl", "doubao"):
+            heights = [h for h, _ in self.dims]
+            widths = [w for _, w in self.dims]
+            batch = model_boxes_to_normalized(
+                self.points, heights, widths, model_type=model_type
+            )
+            for (x, y), (h, w), row in zip(self.points, self.dims, batch.tolist()):
+                action = parse_actions(
+                    f"Action: click(start_box='({x},{y})')", 1000, h, w, model_type
+                )[0]
+                self.assertEqual(tuple(row), action.start_box)
+            back = normalized_boxes_to_model(batch, heights, widths, model_type=model_type)
+            np.testing.assert_allclose(back[:, :2], self.points)
+
+    def test_normalized_boxes_to_screen_matches_scalar(self):
+        boxes = np.array(self.points, dtype=np.float64) / 1000
+        points = normalized_boxes_to_screen(boxes, 1080, 1920).tolist()
+        for (x1, y1), (x, y) in zip(boxes.tolist(), points):
+            self.assertEqual(x, round(float((x1 + x1) / 2) * 1920, 3))
+            self.assertEqual(y, round(float((y1 + y1) / 2) * 1080, 3))
+
+    def test_round_like_python_ties(self):
+        values = [2.675, 0.125, 1.0005, 0.3333]
+        self.assertEqual(round_like_python(values, 2).tolist(),
+                         [round(v, 2) for v in values])
+
+
+if __name__ == '__main__':
+    unittest.main()
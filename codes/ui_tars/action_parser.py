@@ -1,8 +1,13 @@
 # Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
 # SPDX-License-Identifier: Apache-2.0
+import os
 import re
-import ast
+import codecs
 import math
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Optional
 
 IMAGE_FACTOR = 28
 MIN_PIXELS = 100 * 28 * 28
@@ -27,45 +32,187 @@ def convert_point_to_coordinates(text, is_answer=False):
     return re.sub(pattern, replace_match, text).strip()
 
 
-# 定义一个函数来解析每个 action
-def parse_action(action_str):
-    try:
-        # 解析字符串为 AST 节点
-        node = ast.parse(action_str, mode='eval')
+# 动作语法的词法单元，全部为锚定匹配，扫描过程不回溯
+_CALL_HEAD_RE = re.compile(r"\s*([A-Za-z_][\w.]*)\s*\(")
+_KEYWORD_RE = re.compile(r"\s*([A-Za-z_]\w*)\s*=(?!=)")
+_NUMBER_RE = re.compile(r"\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)")
+_NAME_CONST_RE = re.compile(r"\s*(True|False|None)\b")
+_ARG_END_RE = re.compile(r"\s*(,|\))")
+# 引号后面紧跟 `)`、`, key=` 或文本结尾时才视为字符串结束，其余引号按字面量处理
+_STRING_CLOSE_RE = re.compile(r"\s*(?:\)|,\s*(?:[A-Za-z_]\w*\s*=|\))|$)")
+_STRICT_STRING_CLOSE_RE = re.compile(r"\s*(?:\)|,\s*(?:[A-Za-z_]\w*\s*=|\)))")
+# 与 Python 字面量相同的转义：数值转义（\xNN、\uXXXX、\UXXXXXXXX、八进制）和 \N{...}
+_ESCAPE_RE = re.compile(
+    r"\\(x[0-9a-fA-F]{2}|u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8}|N\{[^}]*\}|[0-7]{1,3}|.)",
+    re.DOTALL)
+_ESCAPES = {
+    "n": "\n",
+    "t": "\t",
+    "r": "\r",
+    "a": "\a",
+    "b": "\b",
+    "f": "\f",
+    "v": "\v",
+    "\n": "",
+    "\\": "\\",
+    "'": "'",
+    '"': '"',
+}
+_NAME_CONSTANTS = {"True": True, "False": False, "None": None}
+
+
+def _unescape(match):
+    escape = match.group(1)
+    if escape in _ESCAPES:
+        return _ESCAPES[escape]
+    if len(escape) > 1 or escape in "01234567":
+        try:
+            return codecs.decode(match.group(0), "unicode_escape")
+        except UnicodeError:  # unknown \N{...} name
+            pass
+    return match.group(0)
+
+
+def _scan_string(text, pos, allow_truncated=True):
+    """Scans a quoted value starting at ``text[pos]`` and returns (value, end)."""
+    close_re = _STRING_CLOSE_RE if allow_truncated else _STRICT_STRING_CLOSE_RE
+    quote = text[pos]
+    search_from = pos + 1
+    while True:
+        close = text.find(quote, search_from)
+        if close == -1:
+            raise ValueError(f"Unterminated string at position {pos}")
+        backslashes = 0
+        back = close - 1
+        while back > pos and text[back] == "\\":
+            backslashes += 1
+            back -= 1
+        if backslashes % 2 == 0 and close_re.match(text, close + 1):
+            break
+        search_from = close + 1
+    raw = text[pos + 1:close]
+    if "\\" in raw:
+        raw = _ESCAPE_RE.sub(_unescape, raw)
+    return raw, close + 1
+
+
+def _skip_expression(text, pos, allow_truncated=True):
+    """Skips an unsupported value (tuple, list, call, ...) and returns its end."""
+    depth = 0
+    length = len(text)
+    while pos < length:
+        char = text[pos]
+        if char in "'\"":
+            _, pos = _scan_string(text, pos, allow_truncated)
+            continue
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            if depth == 0:
+                return pos
+            depth -= 1
+        elif char == "," and depth == 0:
+            return pos
+        pos += 1
+    raise ValueError("Unexpected end of action")
+
+
+def _scan_value(text, pos, allow_truncated=True):
+    """Scans one argument value and returns (value, end)."""
+    length = len(text)
+    while pos < length and text[pos].isspace():
+        pos += 1
+    if pos == length:
+        raise ValueError("Missing argument value")
+    if text[pos] in "'\"":
+        return _scan_string(text, pos, allow_truncated)
+    match = _NUMBER_RE.match(text, pos)
+    if match:
+        number = match.group(1)
+        value = float(number) if any(c in number for c in ".eE") else int(number)
+        return value, match.end()
+    match = _NAME_CONST_RE.match(text, pos)
+    if match:
+        return _NAME_CONSTANTS[match.group(1)], match.end()
+    # 非常量参数与 ast 解析时的行为保持一致，值记为 None
+    return None, _skip_expression(text, pos, allow_truncated)
+
+
+def _scan_call(text, pos=0, allow_truncated=True):
+    """
+    Scans a single ``name(key=value, ...)`` call starting at ``pos``.
 
-        # 确保节点是一个表达式
-        if not isinstance(node, ast.Expression):
-            raise ValueError("Not an expression")
+    The scan is a single left-to-right pass over the input. Unless
+    ``allow_truncated`` is False, a missing closing parenthesis at the end of
+    the text is tolerated, which matches how truncated model outputs were
+    repaired before parsing.
 
-        # 获取表达式的主体
-        call = node.body
+    Returns:
+        A tuple of ({'function': ..., 'args': {...}}, end position).
+    """
+    head = _CALL_HEAD_RE.match(text, pos)
+    if not head:
+        raise ValueError("Not a function call")
+    func_name = head.group(1).rsplit(".", 1)[-1]
+    pos = head.end()
+    kwargs = {}
+    length = len(text)
+    while True:
+        end = _ARG_END_RE.match(text, pos)
+        if end and end.group(1) == ")":
+            return {'function': func_name, 'args': kwargs}, end.end()
+        if allow_truncated and text[pos:].strip() == "":
+            return {'function': func_name, 'args': kwargs}, length
+        keyword = _KEYWORD_RE.match(text, pos)
+        if keyword:
+            value, pos = _scan_value(text, keyword.end(), allow_truncated)
+            kwargs[keyword.group(1)] = value
+        else:
+            # 位置参数被忽略，只保留关键字参数
+            _, pos = _scan_value(text, pos, allow_truncated)
+        end = _ARG_END_RE.match(text, pos)
+        if end:
+            pos = end.end()
+            if end.group(1) == ")":
+                return {'function': func_name, 'args': kwargs}, pos
+        elif allow_truncated and text[pos:].strip() == "":
+            return {'function': func_name, 'args': kwargs}, length
+        else:
+            raise ValueError(f"Unexpected character at position {pos}")
 
-        # 确保主体是一个函数调用
-        if not isinstance(call, ast.Call):
-            raise ValueError("Not a function call")
 
-        # 获取函数名
-        if isinstance(call.func, ast.Name):
-            func_name = call.func.id
-        elif isinstance(call.func, ast.Attribute):
-            func_name = call.func.attr
-        else:
-            func_name = None
-
-        # 获取关键字参数
-        kwargs = {}
-        for kw in call.keywords:
-            key = kw.arg
-            # 处理不同类型的值，这里假设都是常量
-            if isinstance(kw.value, ast.Constant):
-                value = kw.value.value
-            elif isinstance(kw.value, ast.Str):  # 兼容旧版本 Python
-                value = kw.value.s
-            else:
-                value = None
-            kwargs[key] = value
-
-        return {'function': func_name, 'args': kwargs}
+def _parse_action_calls(action_text):
+    """
+    Parses a sequence of action calls, e.g. the part after ``Action: ``.
+
+    Returns:
+        A list of (parsed action, raw action string) tuples.
+    """
+    calls = []
+    pos = 0
+    length = len(action_text)
+    while pos < length:
+        start = pos
+        while start < length and action_text[start].isspace():
+            start += 1
+        if start == length:
+            break
+        try:
+            call, pos = _scan_call(action_text, start)
+        except ValueError as e:
+            raw_str = action_text[start:].strip()
+            raise ValueError(f"Action can't parse: {raw_str} ({e})") from e
+        calls.append((call, action_text[start:pos]))
+    return calls
+
+
+# 定义一个函数来解析每个 action
+def parse_action(action_str):
+    try:
+        call, end = _scan_call(action_str)
+        if action_str[end:].strip():
+            raise ValueError("Unexpected trailing text")
+        return call
 
     except Exception as e:
         print(f"Failed to parse action '{action_str}': {e}")
@@ -93,6 +240,55 @@ def floor_by_factor(number: int, factor: int) -> int:
     return math.floor(number / factor) * factor
 
 
+Box = tuple[float, float, float, float]
+
+
+@dataclass(slots=True)
+class Action:
+    """
+    A parsed action with normalized coordinates.
+
+    Box parameters (``start_box``/``end_box``) are stored in ``action_inputs``
+    as ``(x1, y1, x2, y2)`` float tuples in the [0, 1] range instead of their
+    string form, so code generation can use them without ``eval``.
+    """
+    action_type: str
+    action_inputs: dict = field(default_factory=dict)
+    thought: Optional[str] = None
+    reflection: Optional[str] = None
+
+    @property
+    def start_box(self) -> Optional[Box]:
+        return self.action_inputs.get("start_box")
+
+    @property
+    def end_box(self) -> Optional[Box]:
+        return self.action_inputs.get("end_box")
+
+    def to_dict(self, text: Optional[str] = None) -> dict:
+        """Returns the dict form produced by `parse_action_to_structure_output`."""
+        action_inputs = {
+            key: str(list(value)) if isinstance(value, tuple) else value
+            for key, value in self.action_inputs.items()
+        }
+        return {
+            "reflection": self.reflection,
+            "thought": self.thought,
+            "action_type": self.action_type,
+            "action_inputs": action_inputs,
+            "text": text
+        }
+
+
+def _as_box(value) -> Box:
+    """Converts a box from an `Action` or its legacy string form to a tuple."""
+    if isinstance(value, tuple):
+        return value
+    if not isinstance(value, str):
+        return tuple(value)
+    return tuple(map(float, value.strip().strip("[]()").split(",")))
+
+
 def linear_resize(height: int,
                   width: int,
                   factor: int = IMAGE_FACTOR,
@@ -143,13 +339,106 @@ def smart_resize(height: int,
     return h_bar, w_bar
 
 
-def parse_action_to_structure_output(text,
-                                     factor,
-                                     origin_resized_height,
-                                     origin_resized_width,
-                                     model_type="qwen25vl",
-                                     max_pixels=16384 * 28 * 28,
-                                     min_pixels=100 * 28 * 28):
+# 同一会话的屏幕分辨率几乎不变，缓存的坐标空间数量上限
+COORDINATE_SPACE_CACHE_SIZE = 256
+
+
+@dataclass(frozen=True, slots=True)
+class CoordinateSpace:
+    """
+    Coordinate mapping for one screen, meant to be built once per session.
+
+    Holds the `smart_resize` dimensions (qwen25vl) or the ``factor``
+    (relative-coordinate models) so they are not recomputed on every parse.
+    ``scale`` converts screenshot pixels to input coordinates on HiDPI
+    displays (e.g. 2.0 for a Retina screenshot), and ``offset_x``/``offset_y``
+    give the screen's origin on a multi-monitor desktop.
+
+    Use `get_coordinate_space` to share instances through a bounded LRU cache.
+    """
+    origin_height: int
+    origin_width: int
+    model_type: str = "qwen25vl"
+    factor: int = 1000
+    max_pixels: int = MAX_PIXELS
+    min_pixels: int = MIN_PIXELS
+    scale: float = 1.0
+    offset_x: float = 0
+    offset_y: float = 0
+    resized_height: Optional[int] = field(init=False, default=None)
+    resized_width: Optional[int] = field(init=False, default=None)
+
+    def __post_init__(self):
+        if self.model_type == "qwen25vl":
+            resized_height, resized_width = smart_resize(
+                self.origin_height,
+                self.origin_width,
+                factor=IMAGE_FACTOR,
+                min_pixels=self.min_pixels,
+                max_pixels=self.max_pixels)
+            object.__setattr__(self, "resized_height", resized_height)
+            object.__setattr__(self, "resized_width", resized_width)
+
+    def normalize(self, numbers) -> list[float]:
+        """Maps model-space coordinates ``x1, y1[, x2, y2]`` to [0, 1]."""
+        # Qwen2.5vl output absolute coordinates, qwen2vl output relative coordinates
+        if self.model_type == "qwen25vl":
+            float_numbers = []
+            for num_idx, num in enumerate(numbers):
+                num = float(num)
+                if (num_idx + 1) % 2 == 0:
+                    float_numbers.append(float(num / self.resized_height))
+                else:
+                    float_numbers.append(float(num / self.resized_width))
+            return float_numbers
+        return [float(num) / self.factor for num in numbers]
+
+    def to_screen(self, box, image_height=None, image_width=None):
+        """
+        Returns the screen ``(x, y)`` of a normalized box's center.
+
+        ``image_height``/``image_width`` default to the origin dimensions.
+        """
+        if image_height is None:
+            image_height = self.origin_height
+        if image_width is None:
+            image_width = self.origin_width
+        x, y = _box_center(box)
+        x = x * image_width
+        y = y * image_height
+        if self.scale != 1:
+            x, y = x / self.scale, y / self.scale
+        return (round(x + self.offset_x, 3), round(y + self.offset_y, 3))
+
+
+@lru_cache(maxsize=COORDINATE_SPACE_CACHE_SIZE)
+def get_coordinate_space(origin_height,
+                         origin_width,
+                         model_type="qwen25vl",
+                         factor=1000,
+                         max_pixels=MAX_PIXELS,
+                         min_pixels=MIN_PIXELS,
+                         scale=1.0,
+                         offset_x=0,
+                         offset_y=0) -> CoordinateSpace:
+    """Returns a shared `CoordinateSpace`, memoized by its parameters."""
+    return CoordinateSpace(origin_height, origin_width, model_type, factor,
+                           max_pixels, min_pixels, scale, offset_x, offset_y)
+
+
+def _box_center(box):
+    """Returns the normalized ``(x, y)`` center of a 2- or 4-number box."""
+    if len(box) == 4:
+        x1, y1, x2, y2 = box  # Assuming box is in [x1, y1, x2, y2]
+    else:
+        x1, y1 = box
+        x2 = x1
+        y2 = y1
+    return float((x1 + x2) / 2), float((y1 + y2) / 2)
+
+
+def _normalize_response(text):
+    """Rewrites point-style coordinates and parameters into box form."""
     text = text.strip()
 
     if "<point>" in text:
@@ -160,130 +449,637 @@ def parse_action_to_structure_output(text,
         text = text.replace("end_point=", "end_box=")
     if "point=" in text:
         text = text.replace("point=", "start_box=")
+    return text
+
+
+# 响应文本长度上限，保证单条输出的解析开销有界
+MAX_RESPONSE_CHARS = 64 * 1024
+
+_ACTION_MARKER = "Action: "
+_THOUGHT_MARKER = "Thought: "
+_REFLECTION_MARKER = "Reflection: "
+_SUMMARY_MARKER = "Action_Summary: "
+
+
+def _section_end(text, start, limit):
+    """Returns where a header section starting at ``start`` ends."""
+    # 与 `(.+?)(?=\s*Action: |$)` 等价：内容至少一个字符，止于第一个 Action:
+    end = text.find(_ACTION_MARKER, start + 1, limit)
+    return limit if end == -1 else end
+
+
+def _split_response(text, tolerant=False, max_chars=MAX_RESPONSE_CHARS):
+    """
+    Splits a normalized response into (reflection, thought, action text).
+
+    Each marker is located with a single `str.find`, so the cost is linear in
+    the text length and never exceeds ``max_chars`` characters of scanning.
+    Longer texts raise ValueError, or are cut to ``max_chars`` when
+    ``tolerant`` is set. A response without ``Action: `` raises ValueError,
+    or yields ``None`` as the action text when ``tolerant`` is set, so
+    truncated completions still return their thought.
+    """
+    if len(text) > max_chars:
+        if not tolerant:
+            raise ValueError(
+                f"Response is {len(text)} characters, limit is {max_chars}")
+        text = text[:max_chars]
+    limit = len(text)
 
-    if model_type == "qwen25vl":
-        smart_resize_height, smart_resize_width = smart_resize(
-            origin_resized_height,
-            origin_resized_width,
-            factor=IMAGE_FACTOR,
-            min_pixels=min_pixels,
-            max_pixels=max_pixels)
-
-    # 正则表达式匹配 Action 字符串
-    if text.startswith("Thought:"):
-        thought_pattern = r"Thought: (.+?)(?=\s*Action: |$)"
-        thought_hint = "Thought: "
-    elif text.startswith("Reflection:"):
-        thought_pattern = r"Reflection: (.+?)Action_Summary: (.+?)(?=\s*Action: |$)"
-        thought_hint = "Reflection: "
-    elif text.startswith("Action_Summary:"):
-        thought_pattern = r"Action_Summary: (.+?)(?=\s*Action: |$)"
-        thought_hint = "Action_Summary: "
-    else:
-        thought_pattern = r"Thought: (.+?)(?=\s*Action: |$)"
-        thought_hint = "Thought: "
     reflection, thought = None, None
-    thought_match = re.search(thought_pattern, text, re.DOTALL)
-    if thought_match:
-        if len(thought_match.groups()) == 1:
-            thought = thought_match.group(1).strip()
-        elif len(thought_match.groups()) == 2:
-            thought = thought_match.group(2).strip()
-            reflection = thought_match.group(1).strip()
-    assert "Action:" in text
-    action_str = text.split("Action: ")[-1]
-
-    tmp_all_action = action_str.split(")\n\n")
-    all_action = []
-    for action_str in tmp_all_action:
-        if "type(content" in action_str:
-            if not action_str.strip().endswith(")"):
-                action_str = action_str.strip() + ")"
-            # 正则表达式匹配 content 中的字符串并转义单引号
-            def escape_quotes(match):
-                content = match.group(1)  # 获取 content 的值
-                return content
-
-            # 使用正则表达式进行替换
-            pattern = r"type\(content='(.*?)'\)"  # 匹配 type(content='...')
-            if re.search(pattern, action_str):  # 检查是否有匹配项
-                content = re.sub(pattern, escape_quotes, action_str)
-            else:
-                raise ValueError("Pattern not found in the input string.")
-
-            # 处理字符串
-            action_str = escape_single_quotes(content)
-            action_str = "type(content='" + action_str + "')"
-        if not action_str.strip().endswith(")"):
-            action_str = action_str.strip() + ")"
-        all_action.append(action_str)
-
-    parsed_actions = [
-        parse_action(action.replace("\n", "\\n").lstrip())
-        for action in all_action
-    ]
-    actions = []
-    for action_instance, raw_str in zip(parsed_actions, all_action):
-        if action_instance == None:
-            print(f"Action can't parse: {raw_str}")
-            raise ValueError(f"Action can't parse: {raw_str}")
-        action_type = action_instance["function"]
-        params = action_instance["args"]
-
-        # import pdb; pdb.set_trace()
-        action_inputs = {}
-        for param_name, param in params.items():
-            if param == "": continue
-            param = param.lstrip()  # 去掉引号和多余的空格
-            # 处理start_box或者end_box参数格式 '<bbox>x1 y1 x2 y2</bbox>'
-            action_inputs[param_name.strip()] = param
-
-            if "start_box" in param_name or "end_box" in param_name:
-                ori_box = param
-                # Remove parentheses and split the string by commas
-                numbers = ori_box.replace("(", "").replace(")", "").split(",")
-
-                # Convert to float and scale by 1000
-                # Qwen2.5vl output absolute coordinates, qwen2vl output relative coordinates
-                if model_type == "qwen25vl":
-                    float_numbers = []
-                    for num_idx, num in enumerate(numbers):
-                        num = float(num)
-                        if (num_idx + 1) % 2 == 0:
-                            float_numbers.append(
-                                float(num / smart_resize_height))
-                        else:
-                            float_numbers.append(
-                                float(num / smart_resize_width))
+    if text.startswith("Reflection:"):
+        start = text.find(_REFLECTION_MARKER)
+        if start != -1:
+            start += len(_REFLECTION_MARKER)
+            summary = text.find(_SUMMARY_MARKER, start + 1)
+            if summary != -1:
+                reflection = text[start:summary].strip()
+                start = summary + len(_SUMMARY_MARKER)
+                if start < limit:
+                    thought = text[start:_section_end(text, start,
+                                                      limit)].strip()
                 else:
-                    float_numbers = [float(num) / factor for num in numbers]
-
-                if len(float_numbers) == 2:
-                    float_numbers = [
-                        float_numbers[0], float_numbers[1], float_numbers[0],
-                        float_numbers[1]
-                    ]
-                action_inputs[param_name.strip()] = str(float_numbers)
-
-        # import pdb; pdb.set_trace()
-        actions.append({
-            "reflection": reflection,
-            "thought": thought,
-            "action_type": action_type,
-            "action_inputs": action_inputs,
-            "text": text
-        })
-    return actions
+                    reflection = None
+    else:
+        marker = (_SUMMARY_MARKER if text.startswith("Action_Summary:") else
+                  _THOUGHT_MARKER)
+        start = text.find(marker)
+        if start != -1 and start + len(marker) < limit:
+            start += len(marker)
+            thought = text[start:_section_end(text, start, limit)].strip()
+
+    action_start = text.rfind(_ACTION_MARKER)
+    if action_start == -1:
+        if not tolerant:
+            raise ValueError(f"No '{_ACTION_MARKER.strip()}' found in response")
+        return reflection, thought, None
+    return reflection, thought, text[action_start + len(_ACTION_MARKER):]
+
+
+def _build_action(action_instance, thought, reflection, space):
+    """Converts a parsed call into an `Action` with normalized boxes."""
+    action_type = action_instance["function"]
+    params = action_instance["args"]
+
+    action_inputs = {}
+    for param_name, param in params.items():
+        if param == "": continue
+        param = param.lstrip()  # 去掉引号和多余的空格
+        # 处理start_box或者end_box参数格式 '<bbox>x1 y1 x2 y2</bbox>'
+        action_inputs[param_name.strip()] = param
+
+        if "start_box" in param_name or "end_box" in param_name:
+            ori_box = param
+            # Remove parentheses and split the string by commas
+            numbers = ori_box.replace("(", "").replace(")", "").split(",")
+            float_numbers = space.normalize(numbers)
+
+            if len(float_numbers) == 2:
+                float_numbers = [
+                    float_numbers[0], float_numbers[1], float_numbers[0],
+                    float_numbers[1]
+                ]
+            action_inputs[param_name.strip()] = tuple(float_numbers)
+
+    return Action(action_type, action_inputs, thought, reflection)
+
+
+def _resolve_space(coordinate_space, factor, origin_resized_height,
+                   origin_resized_width, model_type, max_pixels, min_pixels):
+    if coordinate_space is not None:
+        return coordinate_space
+    if origin_resized_height is None or origin_resized_width is None:
+        raise ValueError(
+            "Either coordinate_space or origin_resized_height and "
+            "origin_resized_width must be given")
+    return get_coordinate_space(origin_resized_height, origin_resized_width,
+                                model_type, factor, max_pixels, min_pixels)
+
+
+def _parse_structured(text, space, tolerant=False):
+    """Returns the normalized response text and its list of `Action`."""
+    text = _normalize_response(text)
+
+    reflection, thought, action_str = _split_response(text, tolerant)
+    if action_str is None:
+        return text, []
+
+    actions = [
+        _build_action(action_instance, thought, reflection, space)
+        for action_instance, _ in _parse_action_calls(action_str)
+    ]
+    return text, actions
+
+
+def parse_actions(text,
+                  factor=1000,
+                  origin_resized_height=None,
+                  origin_resized_width=None,
+                  model_type="qwen25vl",
+                  max_pixels=16384 * 28 * 28,
+                  min_pixels=100 * 28 * 28,
+                  coordinate_space=None,
+                  tolerant=False) -> list[Action]:
+    """
+    Parses a model response into a list of typed `Action` objects.
+
+    Takes the same arguments as `parse_action_to_structure_output`, but keeps
+    box coordinates as float tuples and does not attach the response text to
+    every action.
+    """
+    space = _resolve_space(coordinate_space, factor, origin_resized_height,
+                           origin_resized_width, model_type, max_pixels,
+                           min_pixels)
+    return _parse_structured(text, space, tolerant)[1]
+
+
+def parse_action_to_structure_output(text,
+                                     factor=1000,
+                                     origin_resized_height=None,
+                                     origin_resized_width=None,
+                                     model_type="qwen25vl",
+                                     max_pixels=16384 * 28 * 28,
+                                     min_pixels=100 * 28 * 28,
+                                     coordinate_space=None,
+                                     tolerant=False):
+    """
+    Parses a model response into a list of action dicts.
+
+    A `CoordinateSpace` may be passed instead of the factor, dimensions,
+    model type and pixel limits. With ``tolerant=True``, a truncated
+    response without ``Action: `` returns an empty list instead of raising,
+    and responses over `MAX_RESPONSE_CHARS` are cut instead of rejected.
+    """
+    space = _resolve_space(coordinate_space, factor, origin_resized_height,
+                           origin_resized_width, model_type, max_pixels,
+                           min_pixels)
+    text, actions = _parse_structured(text, space, tolerant)
+    return [action.to_dict(text) for action in actions]
+
+
+def _parse_batch_chunk(chunk):
+    """Parses one chunk of a batch, returning (result, error) pairs."""
+    texts, dims, factor, model_type, max_pixels, min_pixels, typed = chunk
+    parse = parse_actions if typed else parse_action_to_structure_output
+    pairs = []
+    for text, (height, width) in zip(texts, dims):
+        try:
+            pairs.append((parse(text, factor, height, width, model_type,
+                                max_pixels, min_pixels), None))
+        except Exception as e:
+            pairs.append((None, e))
+    return pairs
+
+
+def parse_actions_batch(texts,
+                        dims,
+                        model_type="qwen25vl",
+                        workers=None,
+                        factor=1000,
+                        max_pixels=16384 * 28 * 28,
+                        min_pixels=100 * 28 * 28,
+                        chunksize=None,
+                        typed=False):
+    """
+    Parses many model responses, optionally across a process pool.
+
+    Args:
+        texts: Model responses to parse.
+        dims: Either a single ``(height, width)`` pair shared by all responses,
+            or one pair per response.
+        model_type: Model type, as in `parse_action_to_structure_output`.
+        workers: Number of worker processes. Defaults to ``os.cpu_count()``;
+            ``1`` parses in the calling process.
+        factor: Coordinate factor for relative-coordinate models.
+        chunksize: Responses per dispatched task. Defaults to splitting the
+            batch into about four chunks per worker.
+        typed: Return `Action` lists instead of dicts.
+
+    Returns:
+        A tuple ``(results, errors)`` of lists in input order. For each item
+        exactly one of ``results[i]`` and ``errors[i]`` is not None; a
+        malformed response never aborts the rest of the batch.
+    """
+    texts = list(texts)
+    if len(dims) == 2 and isinstance(dims[0], int):
+        dims = [tuple(dims)] * len(texts)
+    else:
+        dims = [tuple(dim) for dim in dims]
+    if len(dims) != len(texts):
+        raise ValueError(
+            f"Got {len(dims)} dims for {len(texts)} texts")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(texts)))
+    if chunksize is None:
+        chunksize = max(1, math.ceil(len(texts) / (workers * 4)))
+
+    chunks = [(texts[i:i + chunksize], dims[i:i + chunksize], factor,
+               model_type, max_pixels, min_pixels, typed)
+              for i in range(0, len(texts), chunksize)]
+    if workers == 1:
+        chunk_pairs = map(_parse_batch_chunk, chunks)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunk_pairs = list(executor.map(_parse_batch_chunk, chunks))
+
+    results, errors = [], []
+    for pairs in chunk_pairs:
+        for result, error in pairs:
+            results.append(result)
+            errors.append(error)
+    return results, errors
+
+
+class StreamingActionParser:
+    """
+    Incrementally parses a model response while it is being generated.
+
+    Feed tokens with `feed` and call `close` once generation ends. Both
+    return a list of ``(kind, payload)`` events:
+
+    - ``("thought", thought)`` as soon as ``Action: `` is seen. The
+      reflection, if any, is available as ``parser.reflection``.
+    - ``("action", Action)`` as soon as an action's closing parenthesis is
+      received, so execution can start before generation finishes.
+
+    Actions are parsed from the first ``Action: `` marker, and produce the same
+    `Action` objects as `parse_actions` for the complete response.
+    """
+
+    ACTION_MARKER = "Action: "
+
+    def __init__(self,
+                 factor=1000,
+                 origin_resized_height=None,
+                 origin_resized_width=None,
+                 model_type="qwen25vl",
+                 max_pixels=16384 * 28 * 28,
+                 min_pixels=100 * 28 * 28,
+                 coordinate_space=None):
+        self.coordinate_space = _resolve_space(coordinate_space, factor,
+                                               origin_resized_height,
+                                               origin_resized_width,
+                                               model_type, max_pixels,
+                                               min_pixels)
+        self._buffer = ""
+        self._marker_search_from = 0
+        self._pos = None
+        self.thought = None
+        self.reflection = None
+        self.actions = []
+
+    @property
+    def text(self):
+        """The raw response received so far."""
+        return self._buffer
+
+    def feed(self, chunk):
+        """Adds generated text and returns the events it completes."""
+        self._buffer += chunk
+        events = []
+        if self._pos is None:
+            marker = self._buffer.find(self.ACTION_MARKER,
+                                       self._marker_search_from)
+            if marker == -1:
+                self._marker_search_from = max(
+                    0, len(self._buffer) - len(self.ACTION_MARKER) + 1)
+                return events
+            header = _normalize_response(self._buffer[:marker])
+            self.reflection, self.thought, _ = _split_response(
+                header + "\n" + self.ACTION_MARKER)
+            self._pos = marker + len(self.ACTION_MARKER)
+            events.append(("thought", self.thought))
+        elif ")" not in chunk:
+            # 动作只会在右括号到达时结束
+            return events
+        events.extend(self._drain(allow_truncated=False))
+        return events
+
+    def close(self):
+        """Parses whatever remains once generation has finished."""
+        if self._pos is None:
+            raise ValueError(
+                f"No '{self.ACTION_MARKER.strip()}' found in response")
+        return self._drain(allow_truncated=True)
+
+    def _drain(self, allow_truncated):
+        events = []
+        text = self._buffer
+        length = len(text)
+        while True:
+            start = self._pos
+            while start < length and text[start].isspace():
+                start += 1
+            if start == length:
+                break
+            try:
+                _, end = _scan_call(text, start, allow_truncated)
+            except ValueError as e:
+                if not allow_truncated:
+                    # 动作尚未生成完整，等待更多 token
+                    break
+                raw_str = text[start:].strip()
+                raise ValueError(
+                    f"Action can't parse: {raw_str} ({e})") from e
+            action_instance, _ = _scan_call(
+                _normalize_response(text[start:end]))
+            action = _build_action(action_instance, self.thought,
+                                   self.reflection, self.coordinate_space)
+            self.actions.append(action)
+            events.append(("action", action))
+            self._pos = end
+        return events
+
+
+@dataclass(frozen=True, slots=True)
+class TimingProfile:
+    """
+    Delays, in seconds, used by generated pyautogui code.
+
+    ``pause`` is the ``pyautogui.PAUSE`` an executor should apply while running
+    the code; code generation leaves it alone. ``None`` keeps the executor's own
+    setting.
+    """
+    action_interval: float = 1  # between consecutive actions
+    type_settle: float = 0.5  # after typing or pasting text
+    write_interval: float = 0.1  # per character of pyautogui.write
+    drag_duration: float = 1.0  # mouse movement of drag/select
+    long_press_duration: float = 1  # hold time of long_press
+    launcher_delay: float = 0.5  # open_app: wait for the launcher to open
+    pause: Optional[float] = None
+
+
+# "conservative" reproduces the historical delays. long_press keeps its hold
+# time in every profile, since a shorter hold turns into a tap.
+TIMING_PROFILES = {
+    "conservative":
+    TimingProfile(),
+    "fast":
+    TimingProfile(action_interval=0.2,
+                  type_settle=0.1,
+                  write_interval=0.01,
+                  drag_duration=0.3,
+                  launcher_delay=0.2,
+                  pause=0.05),
+    "zero":
+    TimingProfile(action_interval=0,
+                  type_settle=0,
+                  write_interval=0,
+                  drag_duration=0,
+                  launcher_delay=0,
+                  pause=0),
+}
+
+
+def get_timing_profile(timing=None) -> TimingProfile:
+    """
+    Resolves ``timing`` to a `TimingProfile`.
+
+    ``timing`` may be None (``"conservative"``), a profile name from
+    `TIMING_PROFILES`, a `TimingProfile`, or a dict of field overrides with an
+    optional ``"profile"`` base name, e.g.
+    ``{"profile": "fast", "drag_duration": 0.5}``.
+    """
+    if timing is None:
+        return TIMING_PROFILES["conservative"]
+    if isinstance(timing, TimingProfile):
+        return timing
+    if isinstance(timing, str):
+        if timing not in TIMING_PROFILES:
+            raise ValueError(f"Unknown timing profile: {timing}")
+        return TIMING_PROFILES[timing]
+    overrides = dict(timing)
+    profile = get_timing_profile(overrides.pop("profile", None))
+    unknown = set(overrides) - set(TimingProfile.__dataclass_fields__)
+    if unknown:
+        raise ValueError(f"Unknown timing fields: {sorted(unknown)}")
+    return replace(profile, **overrides)
+
+
+def _sleep_code(seconds):
+    return f"\ntime.sleep({seconds!r})" if seconds else ""
+
+
+# 按键名称归一化表，模块加载时构建一次；执行器直接执行结构化动作时也使用此表
+KEY_ALIASES = {
+    "arrowleft": "left",
+    "arrowright": "right",
+    "arrowup": "up",
+    "arrowdown": "down",
+    "space": " ",
+}
+
+_ACTION_HANDLERS = {}
+
+
+class CodegenContext:
+    """Per-call settings passed to every action handler."""
+    __slots__ = ("image_height", "image_width", "input_swap",
+                 "coordinate_space", "timing")
+
+    def __init__(self,
+                 image_height,
+                 image_width,
+                 input_swap,
+                 coordinate_space,
+                 timing=None):
+        self.image_height = image_height
+        self.image_width = image_width
+        self.input_swap = input_swap
+        self.coordinate_space = coordinate_space
+        self.timing = get_timing_profile(timing)
+
+    def to_screen(self, box):
+        """Returns the rounded screen ``(x, y)`` of a box center."""
+        if self.coordinate_space is not None:
+            return self.coordinate_space.to_screen(_as_box(box),
+                                                   self.image_height,
+                                                   self.image_width)
+        x, y = _box_center(_as_box(box))
+        return (round(x * self.image_width, 3),
+                round(y * self.image_height, 3))
+
+
+def register_action_handler(*action_types):
+    """
+    Registers a pyautogui code handler for one or more action types.
+
+    The handler is called as ``handler(parts, action_type, action_inputs,
+    context)`` and appends code fragments to ``parts``; the fragments are
+    joined once at the end. Registering an existing action type replaces its
+    handler.
+
+    Example:
+        @register_action_handler("triple_click")
+        def _triple_click(parts, action_type, action_inputs, context):
+            x, y = context.to_screen(action_inputs["start_box"])
+            parts.append(f"\npyautogui.tripleClick({x}, {y})")
+    """
+
+    def decorator(handler):
+        for action_type in action_types:
+            _ACTION_HANDLERS[action_type] = handler
+        return handler
+
+    return decorator
+
+
+def registered_action_types():
+    """Returns the action types that have a code handler."""
+    return frozenset(_ACTION_HANDLERS)
+
+
+def _normalize_key(key):
+    return KEY_ALIASES.get(key, key)
+
+
+def _key_input(action_inputs, fallback):
+    if "key" in action_inputs:
+        return action_inputs.get("key", "")
+    return action_inputs.get(fallback, "")
+
+
+@register_action_handler("hotkey")
+def _compile_hotkey(parts, action_type, action_inputs, context):
+    hotkey = _key_input(action_inputs, "hotkey")
+    if hotkey:
+        # Split the keys by space
+        keys = [repr(_normalize_key(key)) for key in hotkey.split()]
+        parts.append(f"\npyautogui.hotkey({', '.join(keys)})")
+
+
+@register_action_handler("press", "keydown")
+def _compile_key_down(parts, action_type, action_inputs, context):
+    key_to_press = _normalize_key(_key_input(action_inputs, "press"))
+    if key_to_press:
+        # Simulate pressing a single key
+        parts.append(f"\npyautogui.keyDown({repr(key_to_press)})")
+
+
+@register_action_handler("release", "keyup")
+def _compile_key_up(parts, action_type, action_inputs, context):
+    key_to_press = _normalize_key(_key_input(action_inputs, "press"))
+    if key_to_press:
+        parts.append(f"\npyautogui.keyUp({repr(key_to_press)})")
+
+
+@register_action_handler("type")
+def _compile_type(parts, action_type, action_inputs, context):
+    # Parsing typing action using clipboard
+    content = action_inputs.get("content", "")
+    content = escape_single_quotes(content)
+    stripped_content = content
+    submit = content.endswith("\n") or content.endswith("\\n")
+    if submit:
+        stripped_content = stripped_content.rstrip("\\n").rstrip("\n")
+    if content:
+        timing = context.timing
+        if context.input_swap:
+            parts.append(f"\nimport pyperclip"
+                         f"\npyperclip.copy('{stripped_content}')"
+                         f"\npyautogui.hotkey('ctrl', 'v')"
+                         f"{_sleep_code(timing.type_settle)}\n")
+        else:
+            parts.append(
+                f"\npyautogui.write('{stripped_content}', "
+                f"interval={timing.write_interval!r})"
+                f"{_sleep_code(timing.type_settle)}\n")
+        if submit:
+            parts.append("\npyautogui.press('enter')")
+
+
+@register_action_handler("drag", "select")
+def _compile_drag(parts, action_type, action_inputs, context):
+    # Parsing drag or select action based on start and end_boxes
+    start_box = action_inputs.get("start_box")
+    end_box = action_inputs.get("end_box")
+    if start_box and end_box:
+        sx, sy = context.to_screen(start_box)
+        ex, ey = context.to_screen(end_box)
+        parts.append(f"\npyautogui.moveTo({sx}, {sy})\n"
+                     f"\npyautogui.dragTo({ex}, {ey}, "
+                     f"duration={context.timing.drag_duration!r})\n")
+
+
+@register_action_handler("scroll")
+def _compile_scroll(parts, action_type, action_inputs, context):
+    start_box = action_inputs.get("start_box")
+    direction = action_inputs.get("direction", "").lower()
+    if "up" in direction:
+        amount = 5
+    elif "down" in direction:
+        amount = -5
+    else:
+        return
+    if start_box:
+        x, y = context.to_screen(start_box)
+        parts.append(f"\npyautogui.scroll({amount}, x={x}, y={y})")
+    else:
+        parts.append(f"\npyautogui.scroll({amount})")
+
+
+_CLICK_TEMPLATES = {
+    "click": "\npyautogui.click({x}, {y}, button='left')",
+    "left_single": "\npyautogui.click({x}, {y}, button='left')",
+    "left_double": "\npyautogui.doubleClick({x}, {y}, button='left')",
+    "right_single": "\npyautogui.click({x}, {y}, button='right')",
+    "hover": "\npyautogui.moveTo({x}, {y})",
+    # 长按：按下后保持 long_press_duration 秒再抬起
+    "long_press": ("\npyautogui.mouseDown({x}, {y}, button='left')"
+                   "{hold}"
+                   "\npyautogui.mouseUp({x}, {y}, button='left')"),
+}
+
+
+@register_action_handler(*_CLICK_TEMPLATES)
+def _compile_click(parts, action_type, action_inputs, context):
+    # Parsing mouse click actions
+    start_box = action_inputs.get("start_box")
+    if start_box:
+        x, y = context.to_screen(start_box)
+        hold = _sleep_code(context.timing.long_press_duration)
+        parts.append(_CLICK_TEMPLATES[action_type].format(x=x,
+                                                          y=y,
+                                                          hold=hold))
+
+
+# 移动端按键对应 Android 模拟器的键盘映射：Home 键回到桌面，Esc 键返回
+MOBILE_KEYS = {"press_home": "home", "press_back": "esc"}
+
+
+@register_action_handler(*MOBILE_KEYS)
+def _compile_mobile_key(parts, action_type, action_inputs, context):
+    parts.append(f"\npyautogui.press({repr(MOBILE_KEYS[action_type])})")
+
+
+@register_action_handler("open_app")
+def _compile_open_app(parts, action_type, action_inputs, context):
+    # 通过系统启动器搜索应用名称并回车打开
+    app_name = action_inputs.get("app_name", "")
+    if app_name:
+        parts.append(f"\npyautogui.press('win')"
+                     f"{_sleep_code(context.timing.launcher_delay)}"
+                     f"\npyautogui.write({repr(app_name)})"
+                     f"\npyautogui.press('enter')")
+
+
+@register_action_handler("finished")
+def _compile_finished(parts, action_type, action_inputs, context):
+    parts[:] = ["DONE"]
 
 
 def parsing_response_to_pyautogui_code(responses,
-                                       image_height: int,
-                                       image_width: int,
-                                       input_swap: bool = True) -> str:
+                                       image_height: int = None,
+                                       image_width: int = None,
+                                       input_swap: bool = True,
+                                       coordinate_space=None,
+                                       timing=None) -> str:
     '''
     将M模型的输出解析为OSWorld中的action，生成pyautogui代码字符串
     参数:
-        response: 包含模型输出的字典，结构类似于：
+        response: 包含模型输出的字典（或 `Action` 对象），结构类似于：
         {
             "action_type": "hotkey",
             "action_inputs": {
@@ -292,211 +1088,46 @@ def parsing_response_to_pyautogui_code(responses,
                 "end_box": None
             }
         }
+        image_height/image_width: 屏幕尺寸，传入 coordinate_space 时可省略
+        coordinate_space: 可选的 `CoordinateSpace`，用于 HiDPI 缩放和多显示器偏移
+        timing: 可选的时间配置，可为 `TIMING_PROFILES` 中的名称（"conservative"、
+            "fast"、"zero"）、`TimingProfile` 或字段覆盖字典，默认 "conservative"
     返回:
         生成的pyautogui代码字符串
+
+    每种 action_type 由 `register_action_handler` 注册的处理函数生成代码。
     '''
 
-    pyautogui_code = f"import pyautogui\nimport time\n"
+    context = CodegenContext(image_height, image_width, input_swap,
+                             coordinate_space, timing)
+    parts = ["import pyautogui\nimport time\n"]
     if isinstance(responses, dict):
         responses = [responses]
     for response_id, response in enumerate(responses):
-        if "observation" in response:
-            observation = response["observation"]
-        else:
+        if isinstance(response, Action):
             observation = ""
-
-        if "thought" in response:
-            thought = response["thought"]
+            thought = response.thought
+            action_type = response.action_type
+            action_inputs = response.action_inputs
         else:
-            thought = ""
+            observation = response.get("observation", "")
+            thought = response.get("thought", "")
+            action_type = response.get("action_type")
+            action_inputs = response.get("action_inputs", {})
 
         if response_id == 0:
-            pyautogui_code += f"'''\nObservation:\n{observation}\n\nThought:\n{thought}\n'''\n"
+            parts.append(
+                f"'''\nObservation:\n{observation}\n\nThought:\n{thought}\n'''\n")
         else:
-            pyautogui_code += f"\ntime.sleep(1)\n"
-
-        action_dict = response
-        action_type = action_dict.get("action_type")
-        action_inputs = action_dict.get("action_inputs", {})
-
-        if action_type == "hotkey":
-            # Parsing hotkey action
-            if "key" in action_inputs:
-                hotkey = action_inputs.get("key", "")
-            else:
-                hotkey = action_inputs.get("hotkey", "")
-
-            if hotkey == "arrowleft":
-                hotkey = "left"
-
-            elif hotkey == "arrowright":
-                hotkey = "right"
-
-            elif hotkey == "arrowup":
-                hotkey = "up"
-
-            elif hotkey == "arrowdown":
-                hotkey = "down"
-
-            if hotkey:
-                # Handle other hotkeys
-                keys = hotkey.split()  # Split the keys by space
-                convert_keys = []
-                for key in keys:
-                    if key == "space":
-                        key = ' '
-                    convert_keys.append(key)
-                pyautogui_code += f"\npyautogui.hotkey({', '.join([repr(k) for k in convert_keys])})"
-
-        elif action_type in ["press", "keydown"]:
-            # Parsing press action
-            if "key" in action_inputs:
-                key_to_press = action_inputs.get("key", "")
-            else:
-                key_to_press = action_inputs.get("press", "")
-
-            if key_to_press == "arrowleft":
-                key_to_press = "left"
-
-            elif key_to_press == "arrowright":
-                key_to_press = "right"
-
-            elif key_to_press == "arrowup":
-                key_to_press = "up"
-
-            elif key_to_press == "arrowdown":
-                key_to_press = "down"
-
-            elif key_to_press == "space":
-                key_to_press = " "
-
-            if key_to_press:
-                # Simulate pressing a single key
-                pyautogui_code += f"\npyautogui.keyDown({repr(key_to_press)})"
-
-        elif action_type in ["release", "keyup"]:
-            # Parsing press action
-            if "key" in action_inputs:
-                key_to_press = action_inputs.get("key", "")
-            else:
-                key_to_press = action_inputs.get("press", "")
-
-            if key_to_press == "arrowleft":
-                key_to_press = "left"
-
-            elif key_to_press == "arrowright":
-                key_to_press = "right"
-
-            elif key_to_press == "arrowup":
-                key_to_press = "up"
-
-            elif key_to_press == "arrowdown":
-                key_to_press = "down"
-
-            elif key_to_press == "space":
-                key_to_press = " "
-
-            if key_to_press:
-                # Simulate pressing a single key
-                pyautogui_code += f"\npyautogui.keyUp({repr(key_to_press)})"
-
-        elif action_type == "type":
-            # Parsing typing action using clipboard
-            content = action_inputs.get("content", "")
-            content = escape_single_quotes(content)
-            stripped_content = content
-            if content.endswith("\n") or content.endswith("\\n"):
-                stripped_content = stripped_content.rstrip("\\n").rstrip("\n")
-            if content:
-                if input_swap:
-                    pyautogui_code += f"\nimport pyperclip"
-                    pyautogui_code += f"\npyperclip.copy('{stripped_content}')"
-                    pyautogui_code += f"\npyautogui.hotkey('ctrl', 'v')"
-                    pyautogui_code += f"\ntime.sleep(0.5)\n"
-                    if content.endswith("\n") or content.endswith("\\n"):
-                        pyautogui_code += f"\npyautogui.press('enter')"
-                else:
-                    pyautogui_code += f"\npyautogui.write('{stripped_content}', interval=0.1)"
-                    pyautogui_code += f"\ntime.sleep(0.5)\n"
-                    if content.endswith("\n") or content.endswith("\\n"):
-                        pyautogui_code += f"\npyautogui.press('enter')"
-
-        elif action_type in ["drag", "select"]:
-            # Parsing drag or select action based on start and end_boxes
-            start_box = action_inputs.get("start_box")
-            end_box = action_inputs.get("end_box")
-            if start_box and end_box:
-                x1, y1, x2, y2 = eval(
-                    start_box)  # Assuming box is in [x1, y1, x2, y2]
-                sx = round(float((x1 + x2) / 2) * image_width, 3)
-                sy = round(float((y1 + y2) / 2) * image_height, 3)
-                x1, y1, x2, y2 = eval(
-                    end_box)  # Assuming box is in [x1, y1, x2, y2]
-                ex = round(float((x1 + x2) / 2) * image_width, 3)
-                ey = round(float((y1 + y2) / 2) * image_height, 3)
-                pyautogui_code += (
-                    f"\npyautogui.moveTo({sx}, {sy})\n"
-                    f"\npyautogui.dragTo({ex}, {ey}, duration=1.0)\n")
-
-        elif action_type == "scroll":
-            # Parsing scroll action
-            start_box = action_inputs.get("start_box")
-            if start_box:
-                x1, y1, x2, y2 = eval(
-                    start_box)  # Assuming box is in [x1, y1, x2, y2]
-                x = round(float((x1 + x2) / 2) * image_width, 3)
-                y = round(float((y1 + y2) / 2) * image_height, 3)
-
-                # # 先点对应区域，再滚动
-                # pyautogui_code += f"\npyautogui.click({x}, {y}, button='left')"
-            else:
-                x = None
-                y = None
-            direction = action_inputs.get("direction", "")
-
-            if x == None:
-                if "up" in direction.lower():
-                    pyautogui_code += f"\npyautogui.scroll(5)"
-                elif "down" in direction.lower():
-                    pyautogui_code += f"\npyautogui.scroll(-5)"
-            else:
-                if "up" in direction.lower():
-                    pyautogui_code += f"\npyautogui.scroll(5, x={x}, y={y})"
-                elif "down" in direction.lower():
-                    pyautogui_code += f"\npyautogui.scroll(-5, x={x}, y={y})"
-
-        elif action_type in [
-                "click", "left_single", "left_double", "right_single", "hover"
-        ]:
-            # Parsing mouse click actions
-            start_box = action_inputs.get("start_box")
-            start_box = str(start_box)
-            if start_box:
-                start_box = eval(start_box)
-                if len(start_box) == 4:
-                    x1, y1, x2, y2 = start_box  # Assuming box is in [x1, y1, x2, y2]
-                elif len(start_box) == 2:
-                    x1, y1 = start_box
-                    x2 = x1
-                    y2 = y1
-                x = round(float((x1 + x2) / 2) * image_width, 3)
-                y = round(float((y1 + y2) / 2) * image_height, 3)
-                if action_type == "left_single" or action_type == "click":
-                    pyautogui_code += f"\npyautogui.click({x}, {y}, button='left')"
-                elif action_type == "left_double":
-                    pyautogui_code += f"\npyautogui.doubleClick({x}, {y}, button='left')"
-                elif action_type == "right_single":
-                    pyautogui_code += f"\npyautogui.click({x}, {y}, button='right')"
-                elif action_type == "hover":
-                    pyautogui_code += f"\npyautogui.moveTo({x}, {y})"
-
-        elif action_type in ["finished"]:
-            pyautogui_code = f"DONE"
+            parts.append(f"{_sleep_code(context.timing.action_interval)}\n")
 
+        handler = _ACTION_HANDLERS.get(action_type)
+        if handler is None:
+            parts.append(f"\n# Unrecognized action type: {action_type}")
         else:
-            pyautogui_code += f"\n# Unrecognized action type: {action_type}"
+            handler(parts, action_type, action_inputs, context)
 
-    return pyautogui_code
+    return "".join(parts)
 
 
 def add_box_token(input_string):
@@ -0,0 +1,193 @@
+# Copyright (c) 2025 Bytedance Ltd. and/or its affiliates
+# SPDX-License-Identifier: Apache-2.0
+"""
+NumPy-backed batch coordinate conversion.
+
+These functions mirror the scalar math in `parse_action_to_structure_output`
+and `parsing_response_to_pyautogui_code` and return identical values, but
+convert whole arrays of boxes (many steps or many screens) in one call.
+
+Boxes are arrays whose last axis holds ``(x, y)`` or ``(x1, y1, x2, y2)``.
+Screen and image dimensions may be scalars or arrays broadcastable to the
+leading (non-coordinate) shape of the boxes.
+
+Requires ``numpy`` (``pip install ui-tars[numpy]``).
+"""
+import numpy as np
+
+from .action_parser import MAX_PIXELS, MIN_PIXELS, IMAGE_FACTOR, smart_resize
+
+
+def _as_boxes(boxes):
+    """Returns boxes as a float64 array with four coordinates per box."""
+    boxes = np.asarray(boxes, dtype=np.float64)
+    if boxes.shape[-1] == 2:
+        boxes = np.concatenate([boxes, boxes], axis=-1)
+    elif boxes.shape[-1] != 4:
+        raise ValueError(
+            f"Boxes must have 2 or 4 coordinates, got {boxes.shape[-1]}")
+    return boxes
+
+
+def _broadcast_dims(height, width, shape):
+    height = np.broadcast_to(np.asarray(height), shape)
+    width = np.broadcast_to(np.asarray(width), shape)
+    return height, width
+
+
+def _smart_resize_dims(origin_height, origin_width, shape, max_pixels,
+                       min_pixels):
+    """Runs `smart_resize` once per distinct screen size in the batch."""
+    if np.ndim(origin_height) == 0 and np.ndim(origin_width) == 0:
+        height, width = smart_resize(int(origin_height),
+                                     int(origin_width),
+                                     factor=IMAGE_FACTOR,
+                                     min_pixels=min_pixels,
+                                     max_pixels=max_pixels)
+        return np.full(shape, float(height)), np.full(shape, float(width))
+
+    origin_height, origin_width = _broadcast_dims(origin_height, origin_width,
+                                                  shape)
+    # 以 (height, width) 组合成一维键去重，避免逐行比较
+    keys = (origin_height.astype(np.int64) << 32) | origin_width.astype(
+        np.int64)
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    resized = np.array([
+        smart_resize(int(key >> 32),
+                     int(key & 0xFFFFFFFF),
+                     factor=IMAGE_FACTOR,
+                     min_pixels=min_pixels,
+                     max_pixels=max_pixels) for key in unique_keys.tolist()
+    ],
+                       dtype=np.float64).reshape(-1, 2)
+    inverse = inverse.reshape(shape)
+    return resized[inverse, 0], resized[inverse, 1]
+
+
+def _model_scale(boxes_shape, origin_height, origin_width, model_type, factor,
+                 max_pixels, min_pixels):
+    """Returns per-box (x, y) divisors that map model space to [0, 1]."""
+    shape = boxes_shape[:-1]
+    if model_type == "qwen25vl":
+        resized_height, resized_width = _smart_resize_dims(
+            origin_height, origin_width, shape, max_pixels, min_pixels)
+        return resized_width, resized_height
+    scale = np.full(shape, float(factor))
+    return scale, scale
+
+
+def model_boxes_to_normalized(boxes,
+                              origin_height,
+                              origin_width,
+                              model_type="qwen25vl",
+                              factor=1000,
+                              max_pixels=MAX_PIXELS,
+                              min_pixels=MIN_PIXELS):
+    """
+    Converts model-space boxes to normalized ``(x1, y1, x2, y2)`` boxes.
+
+    qwen25vl outputs absolute coordinates on the `smart_resize` image, other
+    model types output coordinates relative to ``factor``. Point boxes are
+    expanded to ``(x, y, x, y)``.
+    """
+    boxes = _as_boxes(boxes)
+    scale_x, scale_y = _model_scale(boxes.shape, origin_height, origin_width,
+                                    model_type, factor, max_pixels,
+                                    min_pixels)
+    normalized = np.empty_like(boxes)
+    normalized[..., 0::2] = boxes[..., 0::2] / scale_x[..., None]
+    normalized[..., 1::2] = boxes[..., 1::2] / scale_y[..., None]
+    return normalized
+
+
+def normalized_boxes_to_model(boxes,
+                              origin_height,
+                              origin_width,
+                              model_type="qwen25vl",
+                              factor=1000,
+                              max_pixels=MAX_PIXELS,
+                              min_pixels=MIN_PIXELS):
+    """Inverse of `model_boxes_to_normalized`."""
+    boxes = _as_boxes(boxes)
+    scale_x, scale_y = _model_scale(boxes.shape, origin_height, origin_width,
+                                    model_type, factor, max_pixels,
+                                    min_pixels)
+    model = np.empty_like(boxes)
+    model[..., 0::2] = boxes[..., 0::2] * scale_x[..., None]
+    model[..., 1::2] = boxes[..., 1::2] * scale_y[..., None]
+    return model
+
+
+def round_like_python(values, decimals=3):
+    """
+    Rounds like the builtin `round`, which differs from `np.round` on ties.
+
+    Values whose scaled fraction is not close to .5 round the same way in
+    both; only the near-tie elements fall back to the builtin.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, decimals)
+    scaled = values * 10.0**decimals
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [
+            round(value, decimals) for value in values[near_tie].tolist()
+        ]
+    return rounded
+
+
+def normalized_boxes_to_screen(boxes, image_height, image_width,
+                               decimals=3):
+    """
+    Converts normalized boxes to screen-pixel ``(x, y)`` centers.
+
+    Matches ``round(float((x1 + x2) / 2) * image_width, 3)`` in
+    `parsing_response_to_pyautogui_code`. Pass ``decimals=None`` to skip
+    rounding.
+    """
+    boxes = _as_boxes(boxes)
+    image_height, image_width = _broadcast_dims(image_height, image_width,
+                                                boxes.shape[:-1])
+    points = np.empty(boxes.shape[:-1] + (2, ), dtype=np.float64)
+    points[..., 0] = (boxes[..., 0] + boxes[..., 2]) / 2 * image_width
+    points[..., 1] = (boxes[..., 1] + boxes[..., 3]) / 2 * image_height
+    if decimals is None:
+        return points
+    return round_like_python(points, decimals)
+
+
+def screen_points_to_normalized(points, image_height, image_width):
+    """Inverse of `normalized_boxes_to_screen`, returning point boxes."""
+    points = np.asarray(points, dtype=np.float64)
+    image_height, image_width = _broadcast_dims(image_height, image_width,
+                                                points.shape[:-1])
+    normalized = np.empty(points.shape[:-1] + (2, ), dtype=np.float64)
+    normalized[..., 0] = points[..., 0] / image_width
+    normalized[..., 1] = points[..., 1] / image_height
+    return _as_boxes(normalized)
+
+
+def model_boxes_to_screen(boxes,
+                          origin_height,
+                          origin_width,
+                          image_height=None,
+                          image_width=None,
+                          model_type="qwen25vl",
+                          factor=1000,
+                          max_pixels=MAX_PIXELS,
+                          min_pixels=MIN_PIXELS,
+                          decimals=3):
+    """
+    Converts model-space boxes straight to screen-pixel centers.
+
+    ``image_height``/``image_width`` default to the origin dimensions.
+    """
+    normalized = model_boxes_to_normalized(boxes, origin_height, origin_width,
+                                           model_type, factor, max_pixels,
+                                           min_pixels)
+    if image_height is None:
+        image_height = origin_height
+    if image_width is None:
+        image_width = origin_width
+    return normalized_boxes_to_screen(normalized, image_height, image_width,
+                                      decimals)
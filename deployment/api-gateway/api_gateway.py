@@ -6,26 +6,234 @@ import os
 import json
 import time
 import uuid
+import zlib
+import base64
+import binascii
+import hashlib
+import asyncio
+from bisect import bisect_left
+from contextlib import asynccontextmanager
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 import httpx
-import redis
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, BackgroundTasks
+import redis.asyncio as aioredis
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
+try:
+    from ui_tars.action_parser import StreamingActionParser, parsing_response_to_pyautogui_code
+except ImportError:
+    StreamingActionParser = None
+
+from blob_store import FilesystemBlobStore, RedisBlobStore, blob_digest, is_digest
+import response_cache
+from response_cache import ResponseCache, perceptual_hash
+
 # Environment variables
 MODEL_SERVICE_URL = os.getenv("MODEL_SERVICE_URL", "http://model-service:8081")
 PARSER_SERVICE_URL = os.getenv("PARSER_SERVICE_URL", "http://parser-service:8082")
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
 
+# Upstream connection pool settings (per upstream, per worker process)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "10"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Per-route timeouts in seconds
+MODEL_TIMEOUT = float(os.getenv("MODEL_TIMEOUT", "120"))
+PARSE_TIMEOUT = float(os.getenv("PARSE_TIMEOUT", "30"))
+EXECUTE_TIMEOUT = float(os.getenv("EXECUTE_TIMEOUT", "60"))
+HEALTH_TIMEOUT = float(os.getenv("HEALTH_TIMEOUT", "5"))
+
+# Chunk size for hashing uploaded screenshots
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Redis connection pool and background cache writer settings
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+CACHE_WRITE_BATCH = int(os.getenv("CACHE_WRITE_BATCH", "100"))
+CACHE_WRITE_QUEUE = int(os.getenv("CACHE_WRITE_QUEUE", "10000"))
+
+# Batch endpoint limits
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "100"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+# Inline base64 screenshots make batches large; keep nginx's client_max_body_size for the route in line
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", str(200 * 1024 * 1024)))
+
+# Coalescing of identical in-flight requests; "image" stands for the screenshot's hash
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+SINGLEFLIGHT_KEY_FIELDS = [
+    name.strip() for name in
+    os.getenv("SINGLEFLIGHT_KEY", "task,image,model_type,factor,origin_width,origin_height,timing_profile").split(",")
+    if name.strip()
+]
+
+# Near-duplicate screenshot response cache (per worker process)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_MAX_DISTANCE = int(os.getenv("RESPONSE_CACHE_MAX_DISTANCE", "4"))
+# Each worker has its own cache; invalidations are broadcast to the others on this channel
+RESPONSE_CACHE_CHANNEL = "response_cache:invalidate"
+
+# Screenshot blob store: filesystem or redis backend, LRU-evicted past BLOB_MAX_BYTES
+BLOB_BACKEND = os.getenv("BLOB_BACKEND", "filesystem").lower()
+BLOB_DIR = os.getenv("BLOB_DIR", "/data/blobs")
+BLOB_MAX_BYTES = int(os.getenv("BLOB_MAX_BYTES", str(1024 * 1024 * 1024)))
+BLOB_MAX_UPLOAD_BYTES = int(os.getenv("BLOB_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+
+# Task record retention and compression (zstd, zlib or none)
+TASK_RECORD_TTL = int(os.getenv("TASK_RECORD_TTL", "7200"))
+TASK_RECORD_COMPRESSION = os.getenv("TASK_RECORD_COMPRESSION", "zstd").lower()
+TASK_RECORD_COMPRESSION_LEVEL = int(os.getenv("TASK_RECORD_COMPRESSION_LEVEL", "3"))
+if TASK_RECORD_COMPRESSION == "zstd" and zstandard is None:
+    print("zstandard is not installed, compressing task records with zlib")
+    TASK_RECORD_COMPRESSION = "zlib"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Request stats: latency histogram bucket upper bounds (ms), plus an overflow bucket
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000]
+# Rollup windows: name -> (slot width in seconds, slots kept)
+STATS_WINDOWS = {
+    "minute": (1, 60),
+    "hour": (60, 60),
+    "day": (3600, 24)
+}
+# model_type labels kept as their own stats group; anything else is counted as "other"
+STATS_MODEL_TYPES = set(os.getenv("STATS_MODEL_TYPES", "qwen25vl,qwen2vl,doubao").split(","))
+STATS_FIELD_KINDS = {"count", "sum_ms", *(f"b{i}" for i in range(len(LATENCY_BUCKETS_MS) + 1))}
+
+
+class UpstreamClient:
+    """Shared pooled httpx client for one downstream service"""
+
+    def __init__(self, name: str, base_url: str):
+        self.name = name
+        self.base_url = base_url
+        self.client: Optional[httpx.AsyncClient] = None
+        self.http2 = False
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.saturated = 0
+        self.pool_timeouts = 0
+
+    def open(self):
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+        )
+        self.http2 = HTTP2_ENABLED
+        try:
+            self.client = httpx.AsyncClient(base_url=self.base_url, limits=limits, http2=self.http2)
+        except ImportError as e:
+            # http2 needs the h2 package (httpx[http2])
+            print(f"HTTP/2 unavailable for {self.name}, using HTTP/1.1: {e}")
+            self.http2 = False
+            self.client = httpx.AsyncClient(base_url=self.base_url, limits=limits)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def request(self, method: str, path: str, timeout: float, **kwargs) -> httpx.Response:
+        """Send a request through the pool, tracking in-flight and saturation counts"""
+        async with self._track():
+            return await self.client.request(
+                method, path,
+                timeout=httpx.Timeout(timeout, pool=HTTP_POOL_TIMEOUT),
+                **kwargs
+            )
+
+    @asynccontextmanager
+    async def stream(self, method: str, path: str, timeout: float, **kwargs):
+        """Like `request`, but yields the response before its body is read"""
+        async with self._track():
+            async with self.client.stream(
+                method, path,
+                timeout=httpx.Timeout(timeout, pool=HTTP_POOL_TIMEOUT),
+                **kwargs
+            ) as response:
+                yield response
+
+    @asynccontextmanager
+    async def _track(self):
+        if self.client is None:
+            self.open()
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        if self.in_flight > HTTP_MAX_CONNECTIONS:
+            # every connection is busy, so this request waits for one
+            self.saturated += 1
+        try:
+            yield
+        except httpx.PoolTimeout:
+            self.pool_timeouts += 1
+            self.errors += 1
+            raise
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "http2": self.http2,
+            "max_connections": HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": HTTP_MAX_KEEPALIVE,
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "saturation": self.in_flight / HTTP_MAX_CONNECTIONS,
+            "saturated_requests": self.saturated,
+            "pool_timeouts": self.pool_timeouts
+        }
+
+
+model_upstream = UpstreamClient("model_service", MODEL_SERVICE_URL)
+parser_upstream = UpstreamClient("parser_service", PARSER_SERVICE_URL)
+UPSTREAMS = [model_upstream, parser_upstream]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    for upstream in UPSTREAMS:
+        upstream.open()
+    cache_writer.start()
+    invalidation_listener = None
+    if RESPONSE_CACHE_ENABLED and redis_client:
+        invalidation_listener = asyncio.create_task(listen_cache_invalidations())
+    yield
+    if invalidation_listener:
+        invalidation_listener.cancel()
+    await cache_writer.stop()
+    for upstream in UPSTREAMS:
+        await upstream.close()
+    if redis_client:
+        await redis_client.aclose()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="UI-TARS API Gateway",
     description="API Gateway for UI-TARS GUI Automation System",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -37,22 +245,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def limit_batch_body(request: Request, call_next):
+    """Reject oversized batches before their body is read and parsed"""
+    if request.url.path == "/api/v1/actions/batch":
+        length = request.headers.get("content-length", "")
+        if length.isdigit() and int(length) > BATCH_MAX_BYTES:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"Batch body exceeds {BATCH_MAX_BYTES} bytes; send screenshots as image_ref blobs"}
+            )
+    return await call_next(request)
+
 # Initialize Redis client
 try:
-    redis_client = redis.from_url(REDIS_URL, decode_responses=True)
+    redis_client = aioredis.from_url(
+        REDIS_URL, max_connections=REDIS_MAX_CONNECTIONS
+    )
 except Exception as e:
     print(f"Redis connection failed: {e}")
     redis_client = None
 
+# Initialize screenshot blob store
+try:
+    if BLOB_BACKEND == "redis":
+        blob_store = RedisBlobStore(redis_client, BLOB_MAX_BYTES) if redis_client else None
+    else:
+        blob_store = FilesystemBlobStore(BLOB_DIR, BLOB_MAX_BYTES)
+except OSError as e:
+    print(f"Blob store unavailable: {e}")
+    blob_store = None
+
 # Pydantic models
 class ActionRequest(BaseModel):
     task: str = Field(..., description="Task description")
     image_base64: Optional[str] = Field(None, description="Base64 encoded screenshot")
     image_url: Optional[str] = Field(None, description="URL to screenshot")
+    image_ref: Optional[str] = Field(None, description="SHA-256 of a screenshot stored with PUT /api/v1/blobs/{sha256}")
     model_type: str = Field("qwen25vl", description="Model type: qwen25vl, qwen2vl, doubao")
     factor: int = Field(1000, description="Coordinate factor")
     origin_width: int = Field(1920, description="Original screen width")
     origin_height: int = Field(1080, description="Original screen height")
+    timing_profile: Optional[str] = Field(None, description="Timing profile of the generated code: conservative, fast, zero")
+    session_id: Optional[str] = Field(None, description="Executor session (leased display) for /api/v1/action/execute")
 
 class ActionResponse(BaseModel):
     task_id: str
@@ -63,6 +298,18 @@ class ActionResponse(BaseModel):
     execution_result: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
     processing_time: float
+    cached: bool = False
+
+class BatchActionRequest(BaseModel):
+    requests: List[ActionRequest] = Field(..., description="Actions to process")
+    max_concurrency: Optional[int] = Field(None, description="Parallel actions, capped at BATCH_MAX_CONCURRENCY")
+    stream: bool = Field(False, description="Return NDJSON lines as actions complete")
+
+class BatchActionResponse(BaseModel):
+    results: List[ActionResponse]
+    succeeded: int
+    failed: int
+    processing_time: float
 
 class HealthResponse(BaseModel):
     status: str
@@ -70,40 +317,378 @@ class HealthResponse(BaseModel):
     timestamp: str
 
 # Helper functions
-async def check_service_health(url: str, timeout: float = 5.0) -> bool:
+class SingleFlight:
+    """Runs one call per key at a time; identical concurrent calls share its result"""
+
+    def __init__(self):
+        self.calls: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn):
+        task = self.calls.get(key)
+        if task is None:
+            # a task of its own, so a disconnecting first caller doesn't cancel the others
+            task = asyncio.create_task(fn())
+            self.calls[key] = task
+            task.add_done_callback(lambda _: self.calls.pop(key, None))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "enabled": SINGLEFLIGHT_ENABLED,
+            "key_fields": SINGLEFLIGHT_KEY_FIELDS,
+            "in_flight": len(self.calls),
+            "model_calls": self.leaders,
+            "model_calls_saved": self.coalesced
+        }
+
+
+singleflight = SingleFlight()
+
+if RESPONSE_CACHE_ENABLED and response_cache.Image is None:
+    print("Pillow is not installed, response cache disabled")
+    RESPONSE_CACHE_ENABLED = False
+screenshot_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_DISTANCE)
+worker_id = uuid.uuid4().hex
+
+async def listen_cache_invalidations():
+    """Apply response cache invalidations published by the other gateway workers"""
+    reconnecting = False
+    while True:
+        try:
+            async with redis_client.pubsub() as pubsub:
+                await pubsub.subscribe(RESPONSE_CACHE_CHANNEL)
+                if reconnecting:
+                    # invalidations sent while disconnected were missed
+                    screenshot_cache.invalidate()
+                    reconnecting = False
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    if data["worker"] != worker_id:
+                        screenshot_cache.invalidate(data["task"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Response cache invalidation listener error: {e}")
+            reconnecting = True
+            await asyncio.sleep(1)
+
+unknown_key_fields = set(SINGLEFLIGHT_KEY_FIELDS) - set(ActionRequest.model_fields) - {"image"}
+if unknown_key_fields:
+    raise ValueError(f"Unknown SINGLEFLIGHT_KEY fields: {sorted(unknown_key_fields)}")
+
+def singleflight_key(request: ActionRequest) -> str:
+    """Hash of the SINGLEFLIGHT_KEY fields of a request"""
+    values = []
+    for name in SINGLEFLIGHT_KEY_FIELDS:
+        if name == "image":
+            image = request.image_base64 or ""
+            values.append([
+                hashlib.sha256(image.encode()).hexdigest() if image else None,
+                request.image_ref,
+                request.image_url
+            ])
+        else:
+            values.append(getattr(request, name))
+    return hashlib.sha256(json.dumps(values).encode()).hexdigest()
+
+async def check_service_health(upstream: UpstreamClient, timeout: float = HEALTH_TIMEOUT) -> bool:
     """Check if a service is healthy"""
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.get(f"{url}/health")
-            return response.status_code == 200
+        response = await upstream.request("GET", "/health", timeout=timeout)
+        return response.status_code == 200
     except:
         return False
 
-def cache_set(key: str, value: Any, expire: int = 3600):
-    """Set cache with expiration"""
-    if redis_client:
+class CacheWriter:
+    """Background task that writes queued cache entries to Redis in pipelines"""
+
+    def __init__(self, batch_size: int, max_queued: int):
+        self.batch_size = batch_size
+        self.max_queued = max_queued
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        # Entries not yet written, so reads right after a write still see them
+        self.pending: Dict[str, Any] = {}
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queued)
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush queued entries and stop the writer"""
+        if self.task is None:
+            return
+        await self.queue.put(None)
+        await self.task
+        self.task = None
+
+    def submit(self, key: str, value: Any, expire: int):
+        if self._put(("set", key, value, expire)):
+            self.pending[key] = value
+
+    def submit_counters(self, key: str, fields: Dict[str, int], expire: Optional[int] = None):
+        """Queue HINCRBY of each field of a hash, refreshing its expiry"""
+        self._put(("incr", key, fields, expire))
+
+    def _put(self, item) -> bool:
+        if self.task is None:
+            return False
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            print(f"Cache write queue full, dropping {item[1]}")
+            return False
+        return True
+
+    async def _run(self):
+        while True:
+            item = await self.queue.get()
+            batch = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size or self.queue.empty():
+                    break
+                item = self.queue.get_nowait()
+            if batch:
+                await self._write(batch)
+            if item is None:
+                return
+
+    async def _write(self, batch):
         try:
-            redis_client.setex(key, expire, json.dumps(value))
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for op, key, value, expire in batch:
+                    if op == "set":
+                        pipe.setex(key, expire, encode_record(value))
+                        continue
+                    for field, amount in value.items():
+                        pipe.hincrby(key, field, amount)
+                    if expire:
+                        pipe.expire(key, expire)
+                await pipe.execute()
+            self.written += len(batch)
+            self.batches += 1
         except Exception as e:
+            self.failed += len(batch)
             print(f"Cache set error: {e}")
+        finally:
+            for _, key, value, _ in batch:
+                if self.pending.get(key) is value:
+                    del self.pending[key]
 
-def cache_get(key: str) -> Optional[Any]:
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "queued": self.queue.qsize() if self.queue else 0,
+            "written": self.written,
+            "batches": self.batches,
+            "failed": self.failed,
+            "dropped": self.dropped
+        }
+
+
+cache_writer = CacheWriter(CACHE_WRITE_BATCH, CACHE_WRITE_QUEUE)
+
+def encode_record(value: Any) -> bytes:
+    """Serialize a cache value as compact JSON, compressed per TASK_RECORD_COMPRESSION"""
+    data = json.dumps(value, separators=(",", ":")).encode()
+    if TASK_RECORD_COMPRESSION == "zstd":
+        return zstandard.ZstdCompressor(level=TASK_RECORD_COMPRESSION_LEVEL).compress(data)
+    if TASK_RECORD_COMPRESSION == "zlib":
+        return zlib.compress(data, TASK_RECORD_COMPRESSION_LEVEL)
+    return data
+
+def decode_record(data: bytes) -> Any:
+    """Inverse of encode_record; the format is detected from the leading bytes"""
+    if data[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ValueError("Record is zstd-compressed but zstandard is not installed")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    elif data[:1] != b"{":
+        data = zlib.decompress(data)
+    return json.loads(data)
+
+def image_digest(image_base64: Optional[str]) -> Optional[Dict[str, Any]]:
+    """SHA-256 and size of a base64 screenshot, stored instead of the image"""
+    if not image_base64:
+        return None
+    encoded = image_base64.split(",", 1)[-1]  # strip a data: URL prefix
+    try:
+        data = base64.b64decode(encoded)
+    except (binascii.Error, ValueError):
+        data = encoded.encode()
+    return {"sha256": hashlib.sha256(data).hexdigest(), "bytes": len(data)}
+
+async def upload_digest(image: UploadFile) -> Dict[str, Any]:
+    """SHA-256 and size of an uploaded screenshot, read in chunks and rewound"""
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = await image.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    await image.seek(0)
+    return {"sha256": digest.hexdigest(), "bytes": size}
+
+def image_content_type(data: bytes) -> str:
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:2] == b"\xff\xd8":
+        return "image/jpeg"
+    return "application/octet-stream"
+
+def build_task_record(task_id: str, request: ActionRequest, parse_data: Dict[str, Any],
+                      processing_time: float, image: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Compact task record: request metadata, image hash and parsed result"""
+    return {
+        "task_id": task_id,
+        "request": {
+            "task": request.task,
+            "model_type": request.model_type,
+            "factor": request.factor,
+            "origin_width": request.origin_width,
+            "origin_height": request.origin_height,
+            "image_url": request.image_url,
+            "image": image or image_digest(request.image_base64)
+        },
+        "response": parse_data,
+        "processing_time": processing_time,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+def cache_set(key: str, value: Any, expire: int = 3600):
+    """Queue a cache write with expiration; returns without waiting on Redis"""
+    if redis_client:
+        cache_writer.submit(key, value, expire)
+
+async def cache_get(key: str) -> Optional[Any]:
     """Get cached value"""
+    if key in cache_writer.pending:
+        return cache_writer.pending[key]
     if redis_client:
         try:
-            value = redis_client.get(key)
-            return json.loads(value) if value else None
+            value = await redis_client.get(key)
+            return decode_record(value) if value else None
         except Exception as e:
             print(f"Cache get error: {e}")
     return None
 
+def record_request(outcome: str, model_type: str, seconds: float):
+    """Add a finished request to the counters and latency histograms"""
+    if not redis_client:
+        return
+    ms = seconds * 1000
+    if model_type not in STATS_MODEL_TYPES:
+        model_type = "other"
+    prefix = f"{outcome}|{model_type}"
+    fields = {
+        f"{prefix}|count": 1,
+        f"{prefix}|sum_ms": round(ms),
+        f"{prefix}|b{bisect_left(LATENCY_BUCKETS_MS, ms)}": 1
+    }
+    now = int(time.time())
+    for name, (width, slots) in STATS_WINDOWS.items():
+        cache_writer.submit_counters(f"stats:{name}:{now // width}", fields, expire=width * (slots + 1))
+    cache_writer.submit_counters("stats:total", fields)
+
+def histogram_percentile(buckets: List[int], q: float) -> Optional[float]:
+    """Estimate a percentile in ms, interpolating linearly inside its bucket"""
+    total = sum(buckets)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for i, count in enumerate(buckets):
+        if count and seen + count >= rank:
+            lower = LATENCY_BUCKETS_MS[i - 1] if i else 0
+            if i == len(LATENCY_BUCKETS_MS):
+                return float(lower)
+            return lower + (LATENCY_BUCKETS_MS[i] - lower) * (rank - seen) / count
+        seen += count
+    return float(LATENCY_BUCKETS_MS[-1])
+
+def summarize_stats(fields: Dict[str, int]) -> Dict[str, Any]:
+    """Turn merged counter fields into totals and percentiles per outcome and model_type"""
+    groups: Dict[str, Dict[str, Dict[str, Any]]] = {"by_outcome": {}, "by_model_type": {}}
+    overall = {"count": 0, "sum_ms": 0, "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+    for field, value in fields.items():
+        # outcome and kind never contain "|"; older gateways wrote model types unchecked
+        head, _, kind = field.rpartition("|")
+        outcome, _, model_type = head.partition("|")
+        if kind not in STATS_FIELD_KINDS:
+            continue
+        targets = [
+            overall,
+            groups["by_outcome"].setdefault(outcome, {"count": 0, "sum_ms": 0, "buckets": [0] * len(overall["buckets"])}),
+            groups["by_model_type"].setdefault(model_type, {"count": 0, "sum_ms": 0, "buckets": [0] * len(overall["buckets"])})
+        ]
+        for target in targets:
+            if kind[0] == "b":
+                target["buckets"][int(kind[1:])] += value
+            else:
+                target[kind] += value
+
+    def summary(agg):
+        return {
+            "count": agg["count"],
+            "avg_ms": agg["sum_ms"] / agg["count"] if agg["count"] else 0,
+            "p50_ms": histogram_percentile(agg["buckets"], 0.50),
+            "p95_ms": histogram_percentile(agg["buckets"], 0.95),
+            "p99_ms": histogram_percentile(agg["buckets"], 0.99)
+        }
+
+    result = summary(overall)
+    for group, aggs in groups.items():
+        result[group] = {name: summary(agg) for name, agg in aggs.items()}
+    return result
+
+async def read_stats() -> Dict[str, Dict[str, int]]:
+    """Fetch and merge the rollup hashes of every window; a fixed number of reads"""
+    now = int(time.time())
+    windows = {
+        name: [f"stats:{name}:{now // width - i}" for i in range(slots)]
+        for name, (width, slots) in STATS_WINDOWS.items()
+    }
+    windows["total"] = ["stats:total"]
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for keys in windows.values():
+            for key in keys:
+                pipe.hgetall(key)
+        hashes = iter(await pipe.execute())
+    merged = {}
+    for name, keys in windows.items():
+        fields: Dict[str, int] = {}
+        for _ in keys:
+            for field, value in next(hashes).items():
+                field = field.decode()
+                fields[field] = fields.get(field, 0) + int(value)
+        merged[name] = fields
+    return merged
+
 # API Endpoints
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
+    model_healthy, parser_healthy = await asyncio.gather(
+        check_service_health(model_upstream),
+        check_service_health(parser_upstream)
+    )
     services = {
-        "model_service": "healthy" if await check_service_health(MODEL_SERVICE_URL) else "unhealthy",
-        "parser_service": "healthy" if await check_service_health(PARSER_SERVICE_URL) else "unhealthy",
+        "model_service": "healthy" if model_healthy else "unhealthy",
+        "parser_service": "healthy" if parser_healthy else "unhealthy",
         "redis": "healthy" if redis_client else "unhealthy"
     }
 
@@ -128,6 +713,66 @@ async def root():
 async def process_action(request: ActionRequest):
     """
     Process GUI automation action
+    """
+    result = await run_action(request)
+    record_request(result.status, request.model_type, result.processing_time)
+    return result
+
+async def run_action(request: ActionRequest, image: Optional[UploadFile] = None) -> ActionResponse:
+    """
+    Model call and parsing for one action, shared by identical in-flight requests
+
+    Uploads are not coalesced, since their file can only be streamed once.
+    """
+    start_time = time.time()
+    bucket = phash = None
+    if RESPONSE_CACHE_ENABLED and image is None:
+        phash = await screenshot_hash(request)
+        if phash is not None:
+            bucket = (request.task, request.model_type, request.factor,
+                      request.origin_width, request.origin_height, request.timing_profile)
+            cached = screenshot_cache.get(bucket, phash)
+            if cached is not None:
+                return ActionResponse(**{
+                    **cached,
+                    "task_id": str(uuid.uuid4()),
+                    "processing_time": time.time() - start_time,
+                    "cached": True
+                })
+
+    if image is not None or not SINGLEFLIGHT_ENABLED:
+        result = await call_pipeline(request, image)
+    else:
+        result = await singleflight.do(singleflight_key(request), lambda: call_pipeline(request))
+        # callers may modify their response (process_and_execute does)
+        result = result.model_copy(deep=True)
+
+    if phash is not None and result.status == "success":
+        screenshot_cache.put(bucket, phash, result.model_dump(exclude={"task_id", "processing_time"}))
+    return result
+
+async def screenshot_hash(request: ActionRequest) -> Optional[int]:
+    """Perceptual hash of the request's screenshot, or None without image bytes"""
+    try:
+        if request.image_base64:
+            data = base64.b64decode(request.image_base64.split(",", 1)[-1])
+        elif request.image_ref and blob_store:
+            data = await blob_store.get(request.image_ref)
+        else:
+            return None
+        if not data:
+            return None
+        return await asyncio.to_thread(perceptual_hash, data)
+    except Exception as e:
+        print(f"Screenshot hash error: {e}")
+        return None
+
+async def call_pipeline(request: ActionRequest, image: Optional[UploadFile] = None) -> ActionResponse:
+    """
+    Model call and parsing for one action
+
+    An uploaded `image`, or the stored blob named by `request.image_ref`, is
+    sent to the model service as multipart bytes instead of base64 JSON.
 
     1. Send image + prompt to model service
     2. Parse model output to structured format
@@ -139,20 +784,37 @@ async def process_action(request: ActionRequest):
 
     try:
         # Step 1: Call model service
-        model_payload = {
-            "task": request.task,
-            "image_base64": request.image_base64,
-            "image_url": request.image_url,
-            "model_type": request.model_type
-        }
+        files = None
+        if image is not None:
+            image_info = await upload_digest(image)
+            files = {"image": (image.filename or "screenshot.png", image.file,
+                               image.content_type or "image/png")}
+        elif request.image_ref:
+            data = await blob_store.get(request.image_ref) if blob_store else None
+            if data is None:
+                raise ValueError(f"Unknown image_ref: {request.image_ref}")
+            image_info = {"sha256": request.image_ref, "bytes": len(data)}
+            files = {"image": ("screenshot", data, image_content_type(data))}
 
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            model_response = await client.post(
-                f"{MODEL_SERVICE_URL}/generate",
-                json=model_payload
+        if files is not None:
+            model_response = await model_upstream.request(
+                "POST", "/generate/upload", timeout=MODEL_TIMEOUT,
+                data={"task": request.task, "model_type": request.model_type},
+                files=files
+            )
+        else:
+            image_info = None
+            model_payload = {
+                "task": request.task,
+                "image_base64": request.image_base64,
+                "image_url": request.image_url,
+                "model_type": request.model_type
+            }
+            model_response = await model_upstream.request(
+                "POST", "/generate", timeout=MODEL_TIMEOUT, json=model_payload
             )
-            model_response.raise_for_status()
-            model_data = model_response.json()
+        model_response.raise_for_status()
+        model_data = model_response.json()
 
         raw_output = model_data.get("output", "")
 
@@ -164,27 +826,22 @@ async def process_action(request: ActionRequest):
             "origin_resized_width": request.origin_width,
             "model_type": request.model_type,
             "image_height": request.origin_height,
-            "image_width": request.origin_width
+            "image_width": request.origin_width,
+            "timing_profile": request.timing_profile
         }
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            parse_response = await client.post(
-                f"{PARSER_SERVICE_URL}/parse",
-                json=parse_payload
-            )
-            parse_response.raise_for_status()
-            parse_data = parse_response.json()
+        parse_response = await parser_upstream.request(
+            "POST", "/parse", timeout=PARSE_TIMEOUT, json=parse_payload
+        )
+        parse_response.raise_for_status()
+        parse_data = parse_response.json()
 
         processing_time = time.time() - start_time
 
         # Cache result
-        cache_data = {
-            "task_id": task_id,
-            "request": request.dict(),
-            "response": parse_data,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        cache_set(f"task:{task_id}", cache_data, expire=7200)
+        if TASK_RECORD_TTL > 0:
+            record = build_task_record(task_id, request, parse_data, processing_time, image_info)
+            cache_set(f"task:{task_id}", record, expire=TASK_RECORD_TTL)
 
         return ActionResponse(
             task_id=task_id,
@@ -215,33 +872,222 @@ async def process_action(request: ActionRequest):
             processing_time=processing_time
         )
 
+@app.post("/api/v1/action/upload", response_model=ActionResponse)
+async def process_action_upload(
+    image: UploadFile = File(..., description="Screenshot file (PNG or JPEG bytes)"),
+    task: str = Form(..., description="Task description"),
+    model_type: str = Form("qwen25vl", description="Model type: qwen25vl, qwen2vl, doubao"),
+    factor: int = Form(1000, description="Coordinate factor"),
+    origin_width: int = Form(1920, description="Original screen width"),
+    origin_height: int = Form(1080, description="Original screen height"),
+    timing_profile: Optional[str] = Form(None, description="Timing profile of the generated code: conservative, fast, zero")
+):
+    """
+    Process GUI automation action from a multipart screenshot upload
+
+    Same as /api/v1/action, but the screenshot is sent as raw bytes instead
+    of base64 in JSON, and is streamed on to the model service as is.
+    """
+    request = ActionRequest(
+        task=task,
+        model_type=model_type,
+        factor=factor,
+        origin_width=origin_width,
+        origin_height=origin_height,
+        timing_profile=timing_profile
+    )
+    result = await run_action(request, image)
+    record_request(result.status, request.model_type, result.processing_time)
+    return result
+
+async def run_batch(requests: List[ActionRequest], concurrency: int):
+    """Yield (index, result) for each request as it completes, at most `concurrency` at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(index: int, request: ActionRequest):
+        async with semaphore:
+            result = await run_action(request)
+        record_request(result.status, request.model_type, result.processing_time)
+        return index, result
+
+    tasks = [asyncio.create_task(run_one(i, request)) for i, request in enumerate(requests)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # the client went away mid-stream; don't keep calling the model for it
+        for task in tasks:
+            task.cancel()
+
+@app.post("/api/v1/actions/batch")
+async def process_action_batch(batch: BatchActionRequest):
+    """
+    Process several actions in one call with bounded concurrency
+
+    With `stream` set, results are returned as NDJSON lines in completion
+    order, each tagged with its `index` in `requests`; otherwise all results
+    are returned together in request order.
+    """
+    if not batch.requests:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(batch.requests) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_SIZE} requests")
+    concurrency = min(batch.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    concurrency = max(concurrency, 1)
+
+    if batch.stream:
+        async def ndjson():
+            async for index, result in run_batch(batch.requests, concurrency):
+                yield json.dumps({"index": index, **result.model_dump()}) + "\n"
+
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+    start_time = time.time()
+    results: List[Optional[ActionResponse]] = [None] * len(batch.requests)
+    async for index, result in run_batch(batch.requests, concurrency):
+        results[index] = result
+    succeeded = sum(result.status == "success" for result in results)
+    return BatchActionResponse(
+        results=results,
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+        processing_time=time.time() - start_time
+    )
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_model_tokens(request: ActionRequest):
+    """Yield generated text from the model service's /generate_stream as it arrives"""
+    image_base64 = request.image_base64
+    if request.image_ref and not image_base64:
+        data = await blob_store.get(request.image_ref) if blob_store else None
+        if data is None:
+            raise ValueError(f"Unknown image_ref: {request.image_ref}")
+        image_base64 = base64.b64encode(data).decode()
+    model_payload = {
+        "task": request.task,
+        "image_base64": image_base64,
+        "image_url": request.image_url,
+        "model_type": request.model_type
+    }
+    async with model_upstream.stream(
+        "POST", "/generate_stream", timeout=MODEL_TIMEOUT, json=model_payload
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            token = json.loads(line[5:])["token"]
+            if not token.get("special"):
+                yield token["text"]
+
+async def stream_action_events(request: ActionRequest):
+    """SSE events: model tokens, then the thought and each action as soon as they parse"""
+    start_time = time.time()
+    task_id = str(uuid.uuid4())
+    parser = StreamingActionParser(
+        factor=request.factor,
+        origin_resized_height=request.origin_height,
+        origin_resized_width=request.origin_width,
+        model_type=request.model_type
+    )
+    actions = []
+    status, error = "success", None
+
+    def action_event(kind, payload):
+        if kind == "thought":
+            return sse_event("thought", {"thought": payload, "reflection": parser.reflection})
+        action = payload.to_dict()
+        action["pyautogui_code"] = parsing_response_to_pyautogui_code(
+            [payload], request.origin_height, request.origin_width,
+            timing=request.timing_profile
+        )
+        action["index"] = len(actions)
+        actions.append(action)
+        return sse_event("action", action)
+
+    try:
+        async for text in stream_model_tokens(request):
+            yield sse_event("token", {"text": text})
+            for kind, payload in parser.feed(text):
+                yield action_event(kind, payload)
+        for kind, payload in parser.close():
+            yield action_event(kind, payload)
+    except httpx.HTTPStatusError as e:
+        status, error = "error", f"HTTP error from {e.request.url}: {e.response.status_code}"
+    except Exception as e:
+        status, error = "error", str(e)
+
+    processing_time = time.time() - start_time
+    record_request(status, request.model_type, processing_time)
+    if error is not None:
+        yield sse_event("error", {"error": error})
+    elif TASK_RECORD_TTL > 0:
+        parse_data = {"thought": parser.thought, "actions": actions}
+        record = build_task_record(task_id, request, parse_data, processing_time)
+        cache_set(f"task:{task_id}", record, expire=TASK_RECORD_TTL)
+    yield sse_event("done", {
+        "task_id": task_id,
+        "status": status,
+        "actions": len(actions),
+        "processing_time": processing_time
+    })
+
+@app.post("/api/v1/action/stream")
+async def process_action_stream(request: ActionRequest):
+    """
+    Stream a GUI automation action as Server-Sent Events
+
+    Events: `token` for each model token, `thought` once the thought is
+    complete, `action` (with its pyautogui code) as soon as each action has
+    been generated, then `done`, or `error` followed by `done`.
+    """
+    if StreamingActionParser is None:
+        raise HTTPException(status_code=503, detail="Streaming requires the ui-tars package")
+    return StreamingResponse(
+        stream_action_events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/v1/action/stream")
+async def process_action_stream_get(request: ActionRequest = Depends()):
+    """Same as POST /api/v1/action/stream with query parameters, for EventSource clients"""
+    return await process_action_stream(request)
+
 @app.post("/api/v1/action/execute", response_model=ActionResponse)
 async def process_and_execute(request: ActionRequest):
     """
     Process action and execute it directly
     """
+    result = await run_and_execute(request)
+    record_request(result.status, request.model_type, result.processing_time)
+    return result
+
+async def run_and_execute(request: ActionRequest) -> ActionResponse:
     start_time = time.time()
     task_id = str(uuid.uuid4())
 
     try:
         # First get the action
-        action_result = await process_action(request)
+        action_result = await run_action(request)
 
         if action_result.status != "success" or not action_result.pyautogui_code:
             return action_result
 
         # Execute the action
         exec_payload = {
-            "pyautogui_code": action_result.pyautogui_code
+            "pyautogui_code": action_result.pyautogui_code,
+            "timing_profile": request.timing_profile,
+            "session_id": request.session_id
         }
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            exec_response = await client.post(
-                f"{PARSER_SERVICE_URL}/execute",
-                json=exec_payload
-            )
-            exec_response.raise_for_status()
-            exec_data = exec_response.json()
+        exec_response = await parser_upstream.request(
+            "POST", "/execute", timeout=EXECUTE_TIMEOUT, json=exec_payload
+        )
+        exec_response.raise_for_status()
+        exec_data = exec_response.json()
 
         action_result.execution_result = exec_data
         action_result.processing_time = time.time() - start_time
@@ -257,10 +1103,67 @@ async def process_and_execute(request: ActionRequest):
             processing_time=processing_time
         )
 
+@app.put("/api/v1/blobs/{digest}")
+async def put_blob(digest: str, request: Request):
+    """
+    Store a screenshot under the SHA-256 of its bytes
+
+    The body is the raw image. The digest can then be sent as `image_ref`
+    instead of the image; check with HEAD first to skip re-uploading.
+    """
+    if blob_store is None:
+        raise HTTPException(status_code=503, detail="Blob store unavailable")
+    if not is_digest(digest):
+        raise HTTPException(status_code=400, detail="Blob name must be a lowercase hex SHA-256")
+    size = await blob_store.exists(digest)
+    if size is not None:
+        return {"image_ref": digest, "bytes": size, "created": False}
+
+    # reject oversized uploads before reading them, and stop reading a body that lied about its size
+    try:
+        declared = int(request.headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    if declared > BLOB_MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Blob too large")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > BLOB_MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Blob too large")
+    data = bytes(body)
+    if blob_digest(data) != digest:
+        raise HTTPException(status_code=400, detail="Body does not match SHA-256")
+    created = await blob_store.put(digest, data)
+    return {"image_ref": digest, "bytes": len(data), "created": created}
+
+@app.head("/api/v1/blobs/{digest}")
+async def head_blob(digest: str):
+    """Check whether a screenshot blob is stored"""
+    size = await blob_store.exists(digest) if blob_store and is_digest(digest) else None
+    if size is None:
+        return Response(status_code=404)
+    return Response(status_code=200, headers={"Content-Length": str(size)})
+
+@app.delete("/api/v1/cache/responses")
+async def invalidate_response_cache(task: Optional[str] = None):
+    """Drop cached responses for one task description, or all of them, on every worker"""
+    removed = screenshot_cache.invalidate(task)
+    if not (RESPONSE_CACHE_ENABLED and redis_client):
+        return {"removed": removed, "workers_notified": 0}
+    try:
+        listeners = await redis_client.publish(
+            RESPONSE_CACHE_CHANNEL, json.dumps({"worker": worker_id, "task": task})
+        )
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Could not notify the other workers: {e}")
+    # listeners includes this worker's own subscription
+    return {"removed": removed, "workers_notified": max(listeners - 1, 0)}
+
 @app.get("/api/v1/task/{task_id}")
 async def get_task_status(task_id: str):
     """Get task status and results from cache"""
-    cached = cache_get(f"task:{task_id}")
+    cached = await cache_get(f"task:{task_id}")
 
     if not cached:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -274,21 +1177,36 @@ async def get_stats():
         "total_tasks": 0,
         "successful_tasks": 0,
         "failed_tasks": 0,
-        "avg_processing_time": 0
+        "avg_processing_time": 0,
+        "windows": {},
+        "latency_buckets_ms": LATENCY_BUCKETS_MS
     }
 
     if redis_client:
         try:
-            # Get all task keys
-            task_keys = redis_client.keys("task:*")
-            stats["total_tasks"] = len(task_keys)
-
-            # You could add more detailed statistics here
+            merged = await read_stats()
+            total = summarize_stats(merged.pop("total"))
+            stats["total_tasks"] = total["count"]
+            stats["successful_tasks"] = total["by_outcome"].get("success", {}).get("count", 0)
+            stats["failed_tasks"] = total["by_outcome"].get("error", {}).get("count", 0)
+            stats["avg_processing_time"] = total["avg_ms"] / 1000
+            stats["windows"] = {name: summarize_stats(fields) for name, fields in merged.items()}
         except Exception as e:
             print(f"Stats error: {e}")
 
     return stats
 
+@app.get("/api/v1/metrics")
+async def get_metrics():
+    """Get gateway metrics for this worker process"""
+    return {
+        "upstreams": {upstream.name: upstream.metrics() for upstream in UPSTREAMS},
+        "cache_writer": cache_writer.metrics(),
+        "blob_store": blob_store.metrics() if blob_store else None,
+        "singleflight": singleflight.metrics(),
+        "response_cache": {"enabled": RESPONSE_CACHE_ENABLED, **screenshot_cache.metrics()}
+    }
+
 # Error handlers
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
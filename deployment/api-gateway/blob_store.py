@@ -0,0 +1,244 @@
+"""
+Content-addressed screenshot blob store for the API gateway
+Blobs are keyed by the SHA-256 of their bytes and evicted least recently used
+once the store grows past its size limit
+"""
+import os
+import re
+import time
+import fcntl
+import asyncio
+import hashlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Dict, Any
+
+DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+# Eviction frees space down to this fraction of the cap, so directory scans stay rare
+EVICT_TO = 0.9
+
+
+def blob_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def is_digest(value: str) -> bool:
+    return bool(DIGEST_RE.match(value))
+
+
+class SharedUsage:
+    """Total blob bytes kept in the store's lock file; only used while holding its flock"""
+
+    def __init__(self, lock_file):
+        self.lock_file = lock_file
+
+    def read(self) -> Optional[int]:
+        self.lock_file.seek(0)
+        value = self.lock_file.read().strip()
+        return int(value) if value.isdigit() else None
+
+    def write(self, total_bytes: int):
+        self.lock_file.seek(0)
+        self.lock_file.truncate()
+        self.lock_file.write(str(total_bytes))
+        self.lock_file.flush()
+
+
+class FilesystemBlobStore:
+    """
+    Blobs stored as files under `root`, least recently used first by mtime
+    The directory is shared by every gateway worker: the total size lives in
+    the lock file and is updated under its flock, and the directory is only
+    scanned when a put takes the total past the cap; the in-process index is
+    a view for metrics between scans
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock_path = os.path.join(root, ".lock")
+        self.index: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        self.evictions = 0
+        self.lock = asyncio.Lock()
+        os.makedirs(root, exist_ok=True)
+        with self._locked_usage() as usage:
+            self.index, self.total_bytes = self._scan()
+            usage.write(self.total_bytes)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _scan(self):
+        """LRU index and total size of the blobs on disk, from file modification times"""
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if is_digest(name):
+                    try:
+                        stat = os.stat(os.path.join(dirpath, name))
+                    except FileNotFoundError:
+                        continue  # evicted by another worker meanwhile
+                    entries.append((stat.st_mtime, name, stat.st_size))
+        index = OrderedDict((digest, size) for _, digest, size in sorted(entries))
+        return index, sum(index.values())
+
+    @contextmanager
+    def _locked_usage(self):
+        """Hold the store's flock and yield its shared usage counter"""
+        with open(self.lock_path, "a+") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield SharedUsage(lock_file)
+
+    def _touch(self, digest: str, size: int):
+        if digest not in self.index:
+            self.total_bytes += size
+        self.index[digest] = size
+        self.index.move_to_end(digest)
+
+    def _write(self, digest: str, data: bytes):
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _read(self, digest: str) -> Optional[bytes]:
+        path = self._path(digest)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # the LRU order is shared through mtimes
+        except FileNotFoundError:
+            return None
+        return data
+
+    def _stat(self, digest: str) -> Optional[int]:
+        path = self._path(digest)
+        try:
+            size = os.stat(path).st_size
+            os.utime(path)  # a blob confirmed by HEAD is about to be referenced
+        except FileNotFoundError:
+            return None
+        return size
+
+    def _store(self, digest: str, data: bytes) -> int:
+        """Write a blob and evict the oldest blobs of all workers past max_bytes (blocking)"""
+        self._write(digest, data)
+        evicted = 0
+        with self._locked_usage() as usage:
+            total_bytes = usage.read()
+            total_bytes = self._scan()[1] if total_bytes is None else total_bytes + len(data)
+            if total_bytes > self.max_bytes:
+                # the counter can drift (concurrent puts of one blob, files removed by hand); rescan
+                index, total_bytes = self._scan()
+                while total_bytes > self.max_bytes * EVICT_TO and len(index) > 1:
+                    victim, size = index.popitem(last=False)
+                    if victim == digest:
+                        # never evict the blob that was just stored
+                        index[victim] = size
+                        continue
+                    total_bytes -= size
+                    evicted += 1
+                    try:
+                        os.remove(self._path(victim))
+                    except FileNotFoundError:
+                        pass
+                self.index = index
+            usage.write(total_bytes)
+        self._touch(digest, len(data))
+        self.total_bytes = total_bytes
+        return evicted
+
+    async def exists(self, digest: str) -> Optional[int]:
+        """Size of the blob, or None if it is not stored; marks it recently used"""
+        size = await asyncio.to_thread(self._stat, digest)
+        if size is None:
+            return None
+        self._touch(digest, size)
+        return size
+
+    async def put(self, digest: str, data: bytes) -> bool:
+        """Store a blob; returns False if it was already stored"""
+        if await self.exists(digest) is not None:
+            return False
+        async with self.lock:
+            self.evictions += await asyncio.to_thread(self._store, digest, data)
+        return True
+
+    async def get(self, digest: str) -> Optional[bytes]:
+        data = await asyncio.to_thread(self._read, digest)
+        if data is None:
+            self.total_bytes -= self.index.pop(digest, 0)
+            return None
+        self._touch(digest, len(data))
+        return data
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": "filesystem",
+            "blobs": len(self.index),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions
+        }
+
+
+class RedisBlobStore:
+    """Blobs stored in Redis, with LRU order kept in a sorted set shared by all workers"""
+
+    def __init__(self, client, max_bytes: int, prefix: str = "blob"):
+        self.client = client
+        self.max_bytes = max_bytes
+        self.prefix = prefix
+        self.lru_key = f"{prefix}s:lru"
+        self.bytes_key = f"{prefix}s:bytes"
+        self.evictions = 0
+
+    def _key(self, digest: str) -> str:
+        return f"{self.prefix}:{digest}"
+
+    async def exists(self, digest: str) -> Optional[int]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.strlen(self._key(digest))
+            pipe.zadd(self.lru_key, {digest: time.time()}, xx=True)
+            size, _ = await pipe.execute()
+        return size or None
+
+    async def put(self, digest: str, data: bytes) -> bool:
+        if not await self.client.set(self._key(digest), data, nx=True):
+            await self.client.zadd(self.lru_key, {digest: time.time()}, xx=True)
+            return False
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.zadd(self.lru_key, {digest: time.time()})
+            pipe.incrby(self.bytes_key, len(data))
+            _, total_bytes = await pipe.execute()
+        while total_bytes > self.max_bytes:
+            oldest = await self.client.zpopmin(self.lru_key)
+            if not oldest:
+                break
+            victim = oldest[0][0].decode()
+            if victim == digest:
+                # never evict the blob that was just stored
+                await self.client.zadd(self.lru_key, {digest: time.time()})
+                break
+            size = await self.client.strlen(self._key(victim))
+            await self.client.delete(self._key(victim))
+            total_bytes = await self.client.decrby(self.bytes_key, size)
+            self.evictions += 1
+        return True
+
+    async def get(self, digest: str) -> Optional[bytes]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(self._key(digest))
+            pipe.zadd(self.lru_key, {digest: time.time()}, xx=True)
+            data, _ = await pipe.execute()
+        return data
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions
+        }
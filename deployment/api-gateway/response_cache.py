@@ -0,0 +1,134 @@
+"""
+Near-duplicate screenshot response cache for the API gateway
+Model responses are cached per (task, model_type, dims) and looked up by the
+perceptual hash of the screenshot, so visually identical screens reuse them
+"""
+import io
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    from ui_tars.action_parser import smart_resize
+except ImportError:
+    smart_resize = None
+
+HASH_SIZE = 8
+
+
+def perceptual_hash(data: bytes) -> int:
+    """
+    64-bit difference hash of an image, computed on the smart_resize-scaled
+    grayscale image the model sees
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("L")
+        if smart_resize is not None:
+            height, width = smart_resize(image.height, image.width)
+            if (width, height) != image.size:
+                image = image.resize((width, height), Image.BILINEAR)
+        small = image.resize((HASH_SIZE + 1, HASH_SIZE), Image.BOX)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + col]
+            right = pixels[row * (HASH_SIZE + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+class ResponseCache:
+    """
+    In-process LRU/TTL cache of successful responses; a lookup hits when a
+    cached screenshot in the same bucket is within `max_distance` bits
+    """
+
+    def __init__(self, max_entries: int, ttl: float, max_distance: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+        # entry id -> (bucket, hash, response, expires at), oldest first
+        self.entries: "OrderedDict[int, Tuple[tuple, int, Dict[str, Any], float]]" = OrderedDict()
+        self.buckets: Dict[tuple, Dict[int, int]] = {}
+        self.next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _remove(self, entry_id: int):
+        bucket = self.entries.pop(entry_id)[0]
+        members = self.buckets[bucket]
+        del members[entry_id]
+        if not members:
+            del self.buckets[bucket]
+
+    def _nearest(self, bucket: tuple, phash: int) -> Optional[int]:
+        now = time.time()
+        best_id, best_distance = None, self.max_distance + 1
+        for entry_id, cached_hash in list(self.buckets.get(bucket, {}).items()):
+            if self.entries[entry_id][3] < now:
+                self._remove(entry_id)
+                continue
+            distance = (cached_hash ^ phash).bit_count()
+            if distance < best_distance:
+                best_id, best_distance = entry_id, distance
+        return best_id
+
+    def get(self, bucket: tuple, phash: int) -> Optional[Dict[str, Any]]:
+        entry_id = self._nearest(bucket, phash)
+        if entry_id is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(entry_id)
+        return self.entries[entry_id][2]
+
+    def put(self, bucket: tuple, phash: int, response: Dict[str, Any]):
+        entry_id = self._nearest(bucket, phash)
+        if entry_id is not None:
+            self._remove(entry_id)
+        entry_id = self.next_id
+        self.next_id += 1
+        self.entries[entry_id] = (bucket, phash, response, time.time() + self.ttl)
+        self.buckets.setdefault(bucket, {})[entry_id] = phash
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def invalidate(self, task: Optional[str] = None) -> int:
+        """Drop the entries of one task (bucket[0]), or all entries"""
+        if task is None:
+            removed = len(self.entries)
+            self.entries.clear()
+            self.buckets.clear()
+        else:
+            entry_ids = [
+                entry_id for bucket, members in self.buckets.items()
+                if bucket[0] == task for entry_id in members
+            ]
+            for entry_id in entry_ids:
+                self._remove(entry_id)
+            removed = len(entry_ids)
+        self.invalidations += removed
+        return removed
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,113 @@
+"""
+Screen capture latency benchmark for the executor's capture backends.
+
+Captures the display repeatedly with each backend and reports the time to
+grab a raw frame, to build the settle-detection thumbnail from it, to convert
+it to a PIL image, and to encode that image as PNG. Run it inside the
+executor container (or anywhere with an Xvfb display):
+
+    Xvfb :99 -screen 0 1920x1080x24 &
+    DISPLAY=:99 python benchmarks/capture_bench.py
+    DISPLAY=:99 python benchmarks/capture_bench.py --backends xshm,pyautogui --output capture.json
+    DISPLAY=:99 python benchmarks/capture_bench.py --markdown   # table for the README
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "executor-service"))
+
+from capture import BACKEND_ORDER, create_backend
+
+THUMBNAIL_SIZE = (160, 90)
+
+
+def timed(func, iterations):
+    """Milliseconds per call, sorted"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)
+
+
+def summarize(samples):
+    return {
+        "median_ms": statistics.median(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min_ms": samples[0]
+    }
+
+
+def bench_backend(name, display, iterations, encode_iterations):
+    backend = create_backend(name, display, display)
+    try:
+        backend.grab()  # warm up
+        result = {"grab": summarize(timed(backend.grab, iterations))}
+        result["grab_thumbnail"] = summarize(timed(lambda: backend.grab().thumbnail(THUMBNAIL_SIZE), iterations))
+        result["grab_image"] = summarize(timed(lambda: backend.grab().image(), iterations))
+        image = backend.grab().image()
+        for level in (1, 6):
+            result[f"png_level{level}"] = summarize(
+                timed(lambda: image.save(io.BytesIO(), format="PNG", compress_level=level), encode_iterations)
+            )
+        result["size"] = list(image.size)
+        return result
+    finally:
+        backend.close()
+
+
+COLUMNS = ("grab", "grab_thumbnail", "grab_image", "png_level1", "png_level6")
+
+
+def markdown_table(results):
+    """The median results as a Markdown table"""
+    lines = [
+        "| backend | grab | + thumbnail | + PIL image | PNG level 1 | PNG level 6 |",
+        "|---|---|---|---|---|---|"
+    ]
+    for name, result in results["backends"].items():
+        lines.append(f"| {name} | " + " | ".join(f"{result[key]['median_ms']:.2f}" for key in COLUMNS) + " |")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--display", default=os.getenv("DISPLAY", ":99"))
+    parser.add_argument("--backends", default=",".join(BACKEND_ORDER), help="comma separated backends")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--encode-iterations", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--markdown", action="store_true", help="also print a Markdown table of the medians")
+    args = parser.parse_args()
+
+    results = {"display": args.display, "backends": {}}
+    print(f"{'backend':<12}{'grab':>10}{'+thumb':>10}{'+image':>10}{'png l1':>10}{'png l6':>10}  (median ms)")
+    for name in args.backends.split(","):
+        try:
+            result = bench_backend(name, args.display, args.iterations, args.encode_iterations)
+        except Exception as e:
+            print(f"{name:<12}unavailable: {e}")
+            continue
+        results["backends"][name] = result
+        print(f"{name:<12}" + "".join(
+            f"{result[key]['median_ms']:>10.2f}"
+            for key in COLUMNS
+        ))
+
+    if args.markdown:
+        print("\n" + markdown_table(results))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Event-loop latency benchmark for the gateway's Redis task cache.
+
+Runs concurrent simulated requests that each write a task record to Redis,
+while a probe coroutine measures how late the event loop wakes it up. It
+compares the old path (sync `redis` client called from async code) with the
+new one (`redis.asyncio` pool plus the gateway's pipelined CacheWriter).
+
+Needs a running Redis:
+    REDIS_URL=redis://localhost:6379 python benchmarks/redis_event_loop_bench.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+import redis
+import redis.asyncio as aioredis
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api-gateway"))
+
+import api_gateway
+
+PROBE_INTERVAL = 0.001
+
+
+async def probe(lags, stop):
+    """Records how far past its deadline each short sleep wakes up"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+def task_record(payload_bytes):
+    return {
+        "task_id": str(uuid.uuid4()),
+        "request": {"task": "Open the settings", "image_base64": "A" * payload_bytes},
+        "response": {"thought": "Click the gear icon", "action_type": "click"},
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+
+
+async def sync_request(client, record):
+    # Old gateway behaviour: a blocking setex inside an async endpoint
+    await asyncio.sleep(0)
+    client.setex(f"bench:{record['task_id']}", 60, json.dumps(record))
+
+
+async def async_request(record):
+    await asyncio.sleep(0)
+    api_gateway.cache_set(f"bench:{record['task_id']}", record, expire=60)
+
+
+async def run(mode, args):
+    if mode == "sync":
+        client = redis.from_url(args.redis_url)
+    else:
+        api_gateway.redis_client = aioredis.from_url(
+            args.redis_url, max_connections=api_gateway.REDIS_MAX_CONNECTIONS
+        )
+        api_gateway.cache_writer = api_gateway.CacheWriter(
+            api_gateway.CACHE_WRITE_BATCH, api_gateway.CACHE_WRITE_QUEUE
+        )
+        api_gateway.cache_writer.start()
+
+    lags = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    start = time.perf_counter()
+    for _ in range(args.requests // args.concurrency):
+        records = [task_record(args.payload_bytes) for _ in range(args.concurrency)]
+        if mode == "sync":
+            await asyncio.gather(*(sync_request(client, r) for r in records))
+        else:
+            await asyncio.gather(*(async_request(r) for r in records))
+        await asyncio.sleep(0)
+    if mode == "async":
+        await api_gateway.cache_writer.stop()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe_task
+
+    if mode == "sync":
+        client.close()
+    else:
+        await api_gateway.redis_client.aclose()
+
+    lags.sort()
+    return {
+        "mode": mode,
+        "seconds": elapsed,
+        "probes": len(lags),
+        "lag_ms_median": statistics.median(lags) * 1e3,
+        "lag_ms_p99": lags[int(len(lags) * 0.99)] * 1e3,
+        "lag_ms_max": lags[-1] * 1e3
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL", "redis://localhost:6379"))
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--payload-bytes", type=int, default=200_000,
+                        help="size of the fake image_base64 in each record")
+    args = parser.parse_args()
+
+    print(f"{'mode':<8}{'seconds':>10}{'probes':>8}{'lag med ms':>12}{'lag p99 ms':>12}{'lag max ms':>12}")
+    for mode in ("sync", "async"):
+        result = asyncio.run(run(mode, args))
+        print(f"{result['mode']:<8}{result['seconds']:>10.2f}{result['probes']:>8}"
+              f"{result['lag_ms_median']:>12.2f}{result['lag_ms_p99']:>12.2f}{result['lag_ms_max']:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""
+Screen capture backends for the executor service
+Backends return a raw Frame of the X framebuffer; conversion to a PIL image
+and encoding only happen when a caller asks for them
+
+    xshm       MIT-SHM: the X server writes into shared memory, no copies
+    xgetimage  XGetImage: one copy over the X socket
+    imagegrab  Pillow ImageGrab (XCB)
+    pyautogui  pyautogui.screenshot(), the previous behaviour (default display only)
+"""
+import time
+import ctypes
+import ctypes.util
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Tuple
+
+from PIL import Image, ImageGrab
+
+BACKEND_ORDER = ["xshm", "xgetimage", "imagegrab", "pyautogui"]
+
+ZPixmap = 2
+AllPlanes = 0xFFFFFFFF_FFFFFFFF
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+
+class Frame:
+    """
+    One captured screen as a BGRX buffer (or an already decoded image)
+    Frames of the xshm backend point into shared memory and are only valid
+    until the next capture of the same display; call detach() to keep one
+    """
+
+    def __init__(self, width: int, height: int, buffer=None, stride: int = 0,
+                 raw_mode: str = "BGRX", image: Optional[Image.Image] = None):
+        self.width = width
+        self.height = height
+        self.buffer = buffer
+        self.stride = stride
+        self.raw_mode = raw_mode
+        self._image = image
+
+    @classmethod
+    def from_image(cls, image: Image.Image) -> "Frame":
+        return cls(image.width, image.height, image=image)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.width, self.height
+
+    def image(self) -> Image.Image:
+        """RGB image of the frame, converted on first use"""
+        if self._image is None:
+            self._image = Image.frombuffer("RGB", self.size, self.buffer, "raw",
+                                           self.raw_mode, self.stride, 1)
+        return self._image
+
+    def thumbnail(self, size: Tuple[int, int]) -> Image.Image:
+        """Downscaled grayscale copy, for change detection"""
+        return self.image().resize(size, Image.BOX).convert("L")
+
+    def detach(self) -> "Frame":
+        """Copy of the frame that does not share the capture buffer"""
+        if self.buffer is None:
+            return self
+        return Frame(self.width, self.height, bytes(self.buffer), self.stride, self.raw_mode)
+
+
+class XImage(ctypes.Structure):
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+        ("red_mask", ctypes.c_ulong),
+        ("green_mask", ctypes.c_ulong),
+        ("blue_mask", ctypes.c_ulong),
+        ("obdata", ctypes.c_void_p),
+        ("funcs", ctypes.c_void_p * 6),
+    ]
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+XErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+XIOErrorExitHandler = ctypes.CFUNCTYPE(None, ctypes.c_void_p, ctypes.c_void_p)
+
+_xlib = None
+_xlib_lock = threading.Lock()
+# X protocol errors are reported asynchronously; the handler just counts them
+# so a failed request raises in Python instead of killing the process
+_x_errors = []
+
+
+@XErrorHandler
+def _on_x_error(display, event):
+    _x_errors.append(display)
+    return 0
+
+
+def load_xlib():
+    """libX11, libXext and libc through ctypes, loaded once"""
+    global _xlib
+    with _xlib_lock:
+        if _xlib is not None:
+            return _xlib
+        x11 = ctypes.CDLL(ctypes.util.find_library("X11") or "libX11.so.6")
+        xext = ctypes.CDLL(ctypes.util.find_library("Xext") or "libXext.so.6")
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+        x11.XInitThreads()
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+        x11.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XRootWindow.restype = ctypes.c_ulong
+        x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDefaultVisual.restype = ctypes.c_void_p
+        x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+        x11.XGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_int,
+                                  ctypes.c_uint, ctypes.c_uint, ctypes.c_ulong, ctypes.c_int]
+        x11.XGetImage.restype = ctypes.POINTER(XImage)
+        x11.XDestroyImage.argtypes = [ctypes.POINTER(XImage)]
+        x11.XSetErrorHandler.argtypes = [XErrorHandler]
+        x11.XSetErrorHandler.restype = ctypes.c_void_p
+        x11.XSetErrorHandler(_on_x_error)
+        if hasattr(x11, "XSetIOErrorExitHandler"):
+            x11.XSetIOErrorExitHandler.argtypes = [ctypes.c_void_p, XIOErrorExitHandler, ctypes.c_void_p]
+
+        xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+        xext.XShmCreateImage.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int,
+                                         ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo),
+                                         ctypes.c_uint, ctypes.c_uint]
+        xext.XShmCreateImage.restype = ctypes.POINTER(XImage)
+        xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+        xext.XShmGetImage.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XImage),
+                                      ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+
+        libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+        libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+        libc.shmat.restype = ctypes.c_void_p
+        libc.shmdt.argtypes = [ctypes.c_void_p]
+        libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+        _xlib = (x11, xext, libc)
+        return _xlib
+
+
+class XlibBackend:
+    """Shared setup of the ctypes Xlib backends: one connection to one display"""
+
+    name = "xlib"
+
+    def __init__(self, display: str):
+        self.x11, self.xext, self.libc = load_xlib()
+        self.display_name = display
+        self.display = self.x11.XOpenDisplay(display.encode())
+        if not self.display:
+            raise RuntimeError(f"Cannot open display {display}")
+        self.broken = False
+        screen = self.x11.XDefaultScreen(self.display)
+        self.root = self.x11.XRootWindow(self.display, screen)
+        self.visual = self.x11.XDefaultVisual(self.display, screen)
+        self.depth = self.x11.XDefaultDepth(self.display, screen)
+        self.width = self.x11.XDisplayWidth(self.display, screen)
+        self.height = self.x11.XDisplayHeight(self.display, screen)
+        if hasattr(self.x11, "XSetIOErrorExitHandler"):
+            # a dead X server marks the backend broken instead of exiting the process
+            self._io_exit_handler = XIOErrorExitHandler(self._on_io_error)
+            self.x11.XSetIOErrorExitHandler(self.display, self._io_exit_handler, None)
+
+    def _on_io_error(self, display, user_data):
+        self.broken = True
+
+    def _check(self, ok: bool, what: str):
+        errors = len(_x_errors)
+        self.x11.XSync(self.display, 0)
+        if self.broken:
+            raise RuntimeError(f"Lost connection to display {self.display_name}")
+        if not ok or len(_x_errors) > errors:
+            raise RuntimeError(f"{what} failed on display {self.display_name}")
+
+    def close(self):
+        if self.display and not self.broken:
+            self.x11.XCloseDisplay(self.display)
+        self.display = None
+
+
+class XGetImageBackend(XlibBackend):
+    name = "xgetimage"
+
+    def grab(self) -> Frame:
+        ximage = self.x11.XGetImage(self.display, self.root, 0, 0, self.width, self.height, AllPlanes, ZPixmap)
+        self._check(bool(ximage), "XGetImage")
+        try:
+            image = ximage.contents
+            if image.bits_per_pixel != 32:
+                raise RuntimeError(f"Unsupported pixel size: {image.bits_per_pixel} bits")
+            buffer = ctypes.string_at(image.data, image.bytes_per_line * image.height)
+            return Frame(image.width, image.height, buffer, image.bytes_per_line)
+        finally:
+            self.x11.XDestroyImage(ximage)
+
+
+class XShmBackend(XlibBackend):
+    name = "xshm"
+
+    def __init__(self, display: str):
+        super().__init__(display)
+        self.ximage = None
+        self.segment = XShmSegmentInfo()
+        try:
+            if not self.xext.XShmQueryExtension(self.display):
+                raise RuntimeError(f"Display {display} has no MIT-SHM extension")
+            self.ximage = self.xext.XShmCreateImage(self.display, self.visual, self.depth, ZPixmap, None,
+                                                    ctypes.byref(self.segment), self.width, self.height)
+            if not self.ximage:
+                raise RuntimeError("XShmCreateImage failed")
+            image = self.ximage.contents
+            if image.bits_per_pixel != 32:
+                raise RuntimeError(f"Unsupported pixel size: {image.bits_per_pixel} bits")
+            size = image.bytes_per_line * image.height
+            self.segment.shmid = self.libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+            if self.segment.shmid < 0:
+                raise RuntimeError(f"shmget failed: errno {ctypes.get_errno()}")
+            address = self.libc.shmat(self.segment.shmid, None, 0)
+            if address in (None, ctypes.c_void_p(-1).value):
+                self.libc.shmctl(self.segment.shmid, IPC_RMID, None)
+                raise RuntimeError(f"shmat failed: errno {ctypes.get_errno()}")
+            self.segment.shmaddr = image.data = address
+            self.segment.readOnly = 0
+            attached = self.xext.XShmAttach(self.display, ctypes.byref(self.segment))
+            self._check(bool(attached), "XShmAttach")
+            # the segment is freed once both sides detach
+            self.libc.shmctl(self.segment.shmid, IPC_RMID, None)
+            self.buffer = (ctypes.c_char * size).from_address(address)
+            self.stride = image.bytes_per_line
+        except Exception:
+            self.close()
+            raise
+
+    def grab(self) -> Frame:
+        ok = self.xext.XShmGetImage(self.display, self.root, self.ximage, 0, 0, AllPlanes)
+        self._check(bool(ok), "XShmGetImage")
+        return Frame(self.width, self.height, memoryview(self.buffer), self.stride)
+
+    def close(self):
+        if self.display and not self.broken and self.segment.shmaddr:
+            self.xext.XShmDetach(self.display, ctypes.byref(self.segment))
+        if self.segment.shmaddr:
+            self.libc.shmdt(self.segment.shmaddr)
+            self.segment.shmaddr = None
+        if self.ximage:
+            # the data pointer belongs to shm; keep XDestroyImage from freeing it
+            self.ximage.contents.data = None
+            self.x11.XDestroyImage(self.ximage)
+            self.ximage = None
+        super().close()
+
+
+class ImageGrabBackend:
+    name = "imagegrab"
+
+    def __init__(self, display: str):
+        self.display_name = display
+
+    def grab(self) -> Frame:
+        return Frame.from_image(ImageGrab.grab(xdisplay=self.display_name))
+
+    def close(self):
+        pass
+
+
+class PyAutoGUIBackend:
+    name = "pyautogui"
+
+    def __init__(self, display: str):
+        import pyautogui
+        self.pyautogui = pyautogui
+
+    def grab(self) -> Frame:
+        return Frame.from_image(self.pyautogui.screenshot())
+
+    def close(self):
+        pass
+
+
+BACKENDS = {
+    "xshm": XShmBackend,
+    "xgetimage": XGetImageBackend,
+    "imagegrab": ImageGrabBackend,
+    "pyautogui": PyAutoGUIBackend,
+}
+
+
+def create_backend(name: str, display: str, default_display: Optional[str] = None):
+    """Open the named backend, or with "auto" the first of BACKEND_ORDER that works"""
+    if name != "auto":
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown screenshot backend: {name}")
+        return BACKENDS[name](display)
+    for candidate in BACKEND_ORDER:
+        # pyautogui can only capture the display it was imported with
+        if candidate == "pyautogui" and display != default_display:
+            continue
+        backend = None
+        try:
+            backend = BACKENDS[candidate](display)
+            backend.grab()
+            return backend
+        except Exception as e:
+            print(f"Screenshot backend {candidate} unavailable on {display}: {e}")
+            if backend is not None:
+                backend.close()
+    raise RuntimeError(f"No screenshot backend works on display {display}")
+
+
+class ScreenCapturer:
+    """
+    Captures one display with its backend, one capture at a time
+    The backend is opened on first use and reopened after a failed capture,
+    e.g. when the display's Xvfb was restarted
+    """
+
+    def __init__(self, display: str, backend: str = "auto", default_display: Optional[str] = None):
+        self.display = display
+        self.backend_name = backend
+        self.default_display = default_display
+        self.backend = None
+        self.lock = threading.Lock()
+        self.captures = 0
+        self.failures = 0
+        self.capture_seconds = 0.0
+
+    @contextmanager
+    def frame(self):
+        """Capture a frame; it stays valid inside the with block"""
+        with self.lock:
+            start_time = time.perf_counter()
+            try:
+                if self.backend is None:
+                    self.backend = create_backend(self.backend_name, self.display, self.default_display)
+                frame = self.backend.grab()
+            except Exception:
+                self.failures += 1
+                self.reset()
+                raise
+            self.capture_seconds += time.perf_counter() - start_time
+            self.captures += 1
+            yield frame
+
+    def image(self) -> Image.Image:
+        with self.frame() as frame:
+            return frame.image()
+
+    def reset(self):
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "display": self.display,
+            "backend": self.backend.name if self.backend else None,
+            "captures": self.captures,
+            "failures": self.failures,
+            "avg_capture_ms": self.capture_seconds / self.captures * 1000 if self.captures else None
+        }
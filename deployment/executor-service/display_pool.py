@@ -0,0 +1,460 @@
+"""
+Virtual display pool for the executor service
+Starts and supervises Xvfb displays, each driven by its own input worker
+thread, and leases them to sessions so one container can run several
+episodes in parallel
+"""
+import os
+import time
+import uuid
+import queue
+import socket
+import asyncio
+import threading
+import subprocess
+from concurrent.futures import Future
+from typing import Optional, Dict, Any, List, Callable
+
+# pyautogui talks to X through one module-level connection; the proxy below
+# lets each worker thread use a connection to its own display instead
+_thread_display = threading.local()
+
+
+class DisplayUnavailable(RuntimeError):
+    """A pooled display cannot run commands: its X connection or worker is gone"""
+
+
+class ThreadDisplayProxy:
+    """Stands in for pyautogui's X connection, forwarding to the current thread's display"""
+
+    def __init__(self, default):
+        self._default = default
+
+    def __getattr__(self, name):
+        connection = getattr(_thread_display, "connection", None)
+        if connection is None:
+            # a pooled worker without its own connection must never fall back to the shared display
+            if getattr(_thread_display, "pooled", False):
+                raise DisplayUnavailable(f"Display {_thread_display.name} is not connected")
+            connection = self._default
+        return getattr(connection, name)
+
+
+def install_display_proxy() -> bool:
+    """Route pyautogui's X calls through ThreadDisplayProxy; False if pyautogui has no X11 backend"""
+    try:
+        from pyautogui import _pyautogui_x11
+    except ImportError:
+        return False
+    if not isinstance(_pyautogui_x11._display, ThreadDisplayProxy):
+        _pyautogui_x11._display = ThreadDisplayProxy(_pyautogui_x11._display)
+    return True
+
+
+def bind_thread_display(display: str):
+    """Open an X connection to `display` for pyautogui calls made on this thread"""
+    _thread_display.pooled = True
+    _thread_display.name = display
+    from Xlib.display import Display
+    _thread_display.connection = Display(display)
+
+
+def current_display() -> Optional[str]:
+    """Display bound to the current thread, or None for the process default"""
+    return getattr(_thread_display, "name", None)
+
+
+class DisplayClipboard:
+    """pyperclip-style clipboard of one X display, through xclip"""
+
+    def __init__(self, display: str):
+        self.env = {**os.environ, "DISPLAY": display}
+
+    def copy(self, text: str):
+        subprocess.run(["xclip", "-selection", "clipboard"], input=text.encode(), env=self.env, check=True)
+
+    def paste(self) -> str:
+        result = subprocess.run(["xclip", "-selection", "clipboard", "-o"],
+                                capture_output=True, env=self.env, check=True)
+        return result.stdout.decode()
+
+
+class InputWorker:
+    """
+    Thread that runs the blocking pyautogui work of one display
+    Commands run one at a time in submission order; each caller awaits a
+    future, so the event loop stays free for health checks and screenshots
+    A pooled worker that cannot connect to its display fails every command
+    """
+
+    def __init__(self, display: str, bind: bool = False):
+        self.display = display
+        # pooled displays bind their own X connection; the default display uses pyautogui's
+        self.bind = bind
+        self.bind_error: Optional[str] = None
+        self.ready = threading.Event()
+        self.queue: "queue.Queue" = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.running: Optional[str] = None
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.max_queue_depth = 0
+        self.busy_seconds = 0.0
+
+    def start(self, timeout: Optional[float] = None):
+        """Start the thread and wait until it has connected to its display"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name=f"input-worker{self.display}", daemon=True)
+            self.thread.start()
+        self.ready.wait(timeout)
+
+    @property
+    def usable(self) -> bool:
+        return self.thread is not None and self.ready.is_set() and self.bind_error is None
+
+    def stop(self, timeout: Optional[float] = None):
+        """Fail the queued commands, let the running one finish and stop the thread"""
+        with self.lock:
+            thread, self.thread = self.thread, None
+            if thread is None:
+                return
+            self._fail_queued(f"Input worker for display {self.display} stopped")
+            self.queue.put(None)
+        thread.join(timeout)
+
+    def _fail_queued(self, reason: str):
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None and item[0].set_running_or_notify_cancel():
+                self.failed += 1
+                item[0].set_exception(DisplayUnavailable(reason))
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        with self.lock:
+            if self.thread is None:
+                raise DisplayUnavailable(f"Input worker for display {self.display} is not running")
+            future = Future()
+            self.queue.put((future, func, args, kwargs))
+            self.submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return future
+
+    async def run(self, func: Callable, *args, **kwargs):
+        """Run func on the worker thread and wait for its result"""
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def _run(self):
+        if self.bind:
+            try:
+                bind_thread_display(self.display)
+            except Exception as e:
+                self.bind_error = f"Could not connect to display {self.display}: {e}"
+                print(self.bind_error)
+        self.ready.set()
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            future, func, args, kwargs = item
+            # skip commands whose caller went away while they were queued
+            if not future.set_running_or_notify_cancel():
+                self.cancelled += 1
+                continue
+            if self.bind_error:
+                self.failed += 1
+                future.set_exception(DisplayUnavailable(self.bind_error))
+                continue
+            self.running = getattr(func, "__name__", str(func))
+            start_time = time.time()
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                self.failed += 1
+                future.set_exception(e)
+            finally:
+                self.busy_seconds += time.time() - start_time
+                self.completed += 1
+                self.running = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "display": self.display,
+            "alive": self.thread is not None and self.thread.is_alive(),
+            "bind_error": self.bind_error,
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+            "running": self.running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "busy_seconds": self.busy_seconds
+        }
+
+
+class VirtualDisplay:
+    """One Xvfb server, its optional window manager and its input worker"""
+
+    def __init__(self, number: int, screen: str, window_manager: Optional[str], start_timeout: float):
+        self.number = number
+        self.name = f":{number}"
+        self.screen = screen
+        self.window_manager = window_manager
+        self.start_timeout = start_timeout
+        self.xvfb: Optional[subprocess.Popen] = None
+        self.wm: Optional[subprocess.Popen] = None
+        self.worker: Optional[InputWorker] = None
+        self.restarts = 0
+
+    @property
+    def socket_path(self) -> str:
+        return f"/tmp/.X11-unix/X{self.number}"
+
+    @property
+    def lock_path(self) -> str:
+        return f"/tmp/.X{self.number}-lock"
+
+    def _clear_stale_server(self):
+        """Remove the socket and lock file left by a crashed Xvfb of this display number"""
+        try:
+            with open(self.lock_path) as f:
+                pid = int(f.read().strip())
+            os.kill(pid, 0)
+        except (OSError, ValueError):
+            pass  # no lock, unreadable lock or dead owner
+        else:
+            raise RuntimeError(f"Display {self.name} is in use by process {pid}")
+        for path in (self.lock_path, self.socket_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _listening(self) -> bool:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                return False
+        return True
+
+    def _start_server(self):
+        self._clear_stale_server()
+        self.xvfb = subprocess.Popen(
+            ["Xvfb", self.name, "-screen", "0", self.screen, "-nolisten", "tcp"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.time() + self.start_timeout
+        while not self._listening():
+            if self.xvfb.poll() is not None or time.time() > deadline:
+                self._stop_processes()
+                raise RuntimeError(f"Xvfb {self.name} failed to start")
+            time.sleep(0.05)
+        if self.window_manager:
+            self.wm = subprocess.Popen(
+                self.window_manager.split(), env={**os.environ, "DISPLAY": self.name},
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+
+    def _start_worker(self) -> InputWorker:
+        worker = InputWorker(self.name, bind=True)
+        worker.start(timeout=self.start_timeout)
+        if not worker.usable:
+            worker.stop(timeout=5)
+            raise RuntimeError(worker.bind_error or f"Input worker for {self.name} did not start")
+        return worker
+
+    def start(self):
+        self._start_server()
+        try:
+            self.worker = self._start_worker()
+        except RuntimeError:
+            self._stop_processes()
+            raise
+
+    def restart(self):
+        """
+        Replace a dead Xvfb and its worker; the old worker keeps answering
+        (and failing) commands until the new one is swapped in, and is left
+        as None if the restart fails
+        """
+        old_worker = self.worker
+        self._stop_processes()
+        worker = None
+        try:
+            self._start_server()
+            worker = self._start_worker()
+        finally:
+            self.worker = worker
+            if old_worker is not None:
+                old_worker.stop(timeout=5)
+            self.restarts += 1
+
+    def alive(self) -> bool:
+        return self.xvfb is not None and self.xvfb.poll() is None
+
+    def usable(self) -> bool:
+        worker = self.worker
+        return self.alive() and worker is not None and worker.usable
+
+    def stop(self):
+        if self.worker is not None:
+            self.worker.stop(timeout=5)
+            self.worker = None
+        self._stop_processes()
+
+    def _stop_processes(self):
+        for process in (self.wm, self.xvfb):
+            if process is not None and process.poll() is None:
+                process.terminate()
+                try:
+                    process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+        self.wm = self.xvfb = None
+
+
+class Lease:
+    """A session's hold on one display"""
+
+    def __init__(self, session_id: str, display: VirtualDisplay):
+        self.session_id = session_id
+        self.display = display
+        self.leased_at = time.time()
+        self.last_used = self.leased_at
+        self.in_flight = 0
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "display": self.display.name,
+            "leased_at": self.leased_at,
+            "idle_seconds": time.time() - self.last_used,
+            "in_flight": self.in_flight
+        }
+
+
+class DisplayPool:
+    """
+    Fixed set of virtual displays leased to sessions
+    A session keeps its display until it is released or has been idle for
+    `idle_timeout` seconds with no command queued or running
+    """
+
+    def __init__(self, size: int, base: int, screen: str, window_manager: Optional[str],
+                 idle_timeout: float, start_timeout: float = 10.0):
+        self.displays = [
+            VirtualDisplay(base + i, screen, window_manager, start_timeout) for i in range(size)
+        ]
+        self.idle_timeout = idle_timeout
+        self.leases: Dict[str, Lease] = {}
+        self.leased_displays: Dict[str, str] = {}  # display name -> session id
+        self.reclaimed = 0
+        self.rejected = 0
+
+    def start(self):
+        """Start every display (blocking)"""
+        if not install_display_proxy():
+            raise RuntimeError("pyautogui has no X11 backend, so pooled displays cannot get their own input")
+        for display in self.displays:
+            display.start()
+
+    def stop(self):
+        for display in self.displays:
+            display.stop()
+        self.leases.clear()
+        self.leased_displays.clear()
+
+    def supervise(self) -> List[str]:
+        """Restart displays whose Xvfb exited (blocking); returns their names"""
+        restarted = []
+        for display in self.displays:
+            if not display.usable():
+                print(f"Display {display.name} is down, restarting")
+                try:
+                    display.restart()
+                except RuntimeError as e:
+                    print(e)
+                restarted.append(display.name)
+        return restarted
+
+    def acquire(self, session_id: Optional[str] = None) -> Optional[Lease]:
+        """The session's lease, or a new lease on a free display; None if all are taken"""
+        if session_id in self.leases:
+            lease = self.leases[session_id]
+            lease.last_used = time.time()
+            return lease
+        for display in self.displays:
+            if display.name not in self.leased_displays and display.usable():
+                lease = Lease(session_id or str(uuid.uuid4()), display)
+                self.leases[lease.session_id] = lease
+                self.leased_displays[display.name] = lease.session_id
+                return lease
+        self.rejected += 1
+        return None
+
+    def release(self, session_id: str) -> bool:
+        lease = self.leases.pop(session_id, None)
+        if lease is None:
+            return False
+        del self.leased_displays[lease.display.name]
+        return True
+
+    def reap(self) -> List[str]:
+        """Release sessions idle for longer than idle_timeout"""
+        now = time.time()
+        idle = [
+            lease.session_id for lease in self.leases.values()
+            if lease.in_flight == 0 and now - lease.last_used > self.idle_timeout
+        ]
+        for session_id in idle:
+            self.release(session_id)
+        self.reclaimed += len(idle)
+        return idle
+
+    async def run(self, lease: Lease, func: Callable, *args, **kwargs):
+        """
+        Run func on the input worker of the lease's display
+        Raises DisplayUnavailable, and ends the lease, if the display is down
+        """
+        lease.in_flight += 1
+        try:
+            worker = lease.display.worker
+            if worker is None:
+                raise DisplayUnavailable(f"Display {lease.display.name} is unavailable")
+            return await worker.run(func, *args, **kwargs)
+        except DisplayUnavailable:
+            if self.leases.get(lease.session_id) is lease:
+                self.release(lease.session_id)
+            raise
+        finally:
+            lease.in_flight -= 1
+            lease.last_used = time.time()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "size": len(self.displays),
+            "leased": len(self.leases),
+            "free": len(self.displays) - len(self.leases),
+            "idle_timeout": self.idle_timeout,
+            "reclaimed": self.reclaimed,
+            "rejected": self.rejected,
+            "sessions": [lease.info() for lease in self.leases.values()],
+            "displays": [
+                {
+                    "display": display.name,
+                    "alive": display.alive(),
+                    "usable": display.usable(),
+                    "restarts": display.restarts,
+                    "session_id": self.leased_displays.get(display.name),
+                    "input_worker": display.worker.metrics() if display.worker else None
+                }
+                for display in self.displays
+            ]
+        }
@@ -6,26 +6,90 @@ import os
 import sys
 import time
 import uuid
+import asyncio
+import builtins
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Callable, Union
 
 import redis
 import pyautogui
 import pyperclip
-from PIL import Image
+from PIL import Image, ImageChops, ImageStat
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
+from ui_tars.action_parser import (
+    KEY_ALIASES,
+    MOBILE_KEYS,
+    TimingProfile,
+    get_timing_profile,
+    parsing_response_to_pyautogui_code,
+    registered_action_types,
+)
+
+from capture import ScreenCapturer
+from display_pool import DisplayPool, DisplayClipboard, DisplayUnavailable, InputWorker, Lease, current_display
 
 # Environment variables
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
 DISPLAY = os.getenv("DISPLAY", ":99")
 
+# Screen-settle detection after execution: poll downscaled captures until the
+# frame has not changed for SETTLE_WINDOW seconds, or SETTLE_TIMEOUT passes
+SETTLE_ENABLED = os.getenv("SETTLE_ENABLED", "true").lower() in ("1", "true", "yes")
+SETTLE_WINDOW = float(os.getenv("SETTLE_WINDOW", "0.3"))
+SETTLE_TIMEOUT = float(os.getenv("SETTLE_TIMEOUT", "3.0"))
+SETTLE_INTERVAL = float(os.getenv("SETTLE_INTERVAL", "0.05"))
+# Mean absolute gray-level difference below which two thumbnails count as equal
+SETTLE_DIFF_THRESHOLD = float(os.getenv("SETTLE_DIFF_THRESHOLD", "0.5"))
+SETTLE_THUMBNAIL_SIZE = (160, 90)
+
+# Screen capture: auto picks the first working of xshm, xgetimage, imagegrab, pyautogui
+SCREENSHOT_BACKEND = os.getenv("SCREENSHOT_BACKEND", "auto")
+SCREENSHOT_COMPRESS_LEVEL = int(os.getenv("SCREENSHOT_COMPRESS_LEVEL", "1"))
+
+# Pool of extra Xvfb displays leased to sessions (0 = only the default DISPLAY)
+DISPLAY_POOL_SIZE = int(os.getenv("DISPLAY_POOL_SIZE", "0"))
+DISPLAY_POOL_BASE = int(os.getenv("DISPLAY_POOL_BASE", "100"))
+DISPLAY_POOL_SCREEN = os.getenv("DISPLAY_POOL_SCREEN", "1920x1080x24")
+DISPLAY_POOL_WM = os.getenv("DISPLAY_POOL_WM", "fluxbox")
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "300"))
+SESSION_REAP_INTERVAL = float(os.getenv("SESSION_REAP_INTERVAL", "10"))
+
+input_worker = InputWorker(DISPLAY)
+display_pool = DisplayPool(
+    DISPLAY_POOL_SIZE, DISPLAY_POOL_BASE, DISPLAY_POOL_SCREEN,
+    DISPLAY_POOL_WM or None, SESSION_IDLE_TIMEOUT
+) if DISPLAY_POOL_SIZE > 0 else None
+
+async def maintain_display_pool():
+    """Reclaim idle sessions and restart displays whose Xvfb died"""
+    while True:
+        await asyncio.sleep(SESSION_REAP_INTERVAL)
+        for session_id in display_pool.reap():
+            print(f"Reclaimed idle session {session_id}")
+        await asyncio.to_thread(display_pool.supervise)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    input_worker.start()
+    maintenance = None
+    if display_pool:
+        await asyncio.to_thread(display_pool.start)
+        maintenance = asyncio.create_task(maintain_display_pool())
+    yield
+    if maintenance:
+        maintenance.cancel()
+        await asyncio.to_thread(display_pool.stop)
+    await asyncio.to_thread(input_worker.stop)
+
 # Initialize FastAPI app
 app = FastAPI(
     title="UI-TARS Executor Service",
     description="Execution service for PyAutoGUI automation",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -46,22 +110,75 @@ except Exception as e:
 
 # Configure PyAutoGUI
 pyautogui.FAILSAFE = False
-pyautogui.PAUSE = 0.5
+pyautogui.PAUSE = float(os.getenv("PYAUTOGUI_PAUSE", "0.5"))
 
 # Pydantic models
 class ExecuteRequest(BaseModel):
     code: str = Field(..., description="PyAutoGUI code to execute")
+    session_id: Optional[str] = Field(None, description="Session whose leased display runs the code; default display if unset")
+    timing_profile: Optional[Union[str, Dict[str, Any]]] = Field(None, description="Timing profile whose pause applies while the code runs")
     screenshot_before: bool = Field(False, description="Take screenshot before execution")
     screenshot_after: bool = Field(True, description="Take screenshot after execution")
+    settle_timeout: Optional[float] = Field(None, description="Max seconds to wait for the screen to settle")
+    settle_window: Optional[float] = Field(None, description="Seconds the screen must stay unchanged")
 
 class ExecuteResponse(BaseModel):
     status: str
     execution_id: str
+    session_id: Optional[str] = None
+    display: Optional[str] = None
     message: Optional[str] = None
     screenshot_before: Optional[str] = None
     screenshot_after: Optional[str] = None
     error: Optional[str] = None
     execution_time: float
+    settle_time: Optional[float] = None
+    settled: Optional[bool] = None
+
+class StructuredAction(BaseModel):
+    action_type: str = Field(..., description="Action type, e.g. click, type, hotkey")
+    action_inputs: Dict[str, Any] = Field(default_factory=dict, description="Action parameters as produced by the parser")
+
+class ExecuteActionsRequest(BaseModel):
+    actions: List[StructuredAction] = Field(..., description="Structured actions from the parser service")
+    session_id: Optional[str] = Field(None, description="Session whose leased display runs the actions; default display if unset")
+    image_width: int = Field(1920, description="Screen width used to scale normalized boxes")
+    image_height: int = Field(1080, description="Screen height used to scale normalized boxes")
+    input_swap: bool = Field(True, description="Type text via clipboard paste")
+    timing_profile: Optional[Union[str, Dict[str, Any]]] = Field(None, description="Timing profile name, or overrides with an optional \"profile\" base")
+    screenshot_before: bool = Field(False, description="Take screenshot before execution")
+    screenshot_after: bool = Field(True, description="Take screenshot after execution")
+    settle_timeout: Optional[float] = Field(None, description="Max seconds to wait for the screen to settle")
+    settle_window: Optional[float] = Field(None, description="Seconds the screen must stay unchanged")
+
+class ActionResult(BaseModel):
+    action_type: str
+    status: str
+    error: Optional[str] = None
+    execution_time: float
+
+class ExecuteActionsResponse(BaseModel):
+    status: str
+    execution_id: str
+    session_id: Optional[str] = None
+    display: Optional[str] = None
+    results: List[ActionResult]
+    screenshot_before: Optional[str] = None
+    screenshot_after: Optional[str] = None
+    error: Optional[str] = None
+    execution_time: float
+    settle_time: Optional[float] = None
+    settled: Optional[bool] = None
+
+class SessionRequest(BaseModel):
+    session_id: Optional[str] = Field(None, description="Session id to lease a display for; generated if unset")
+
+class SessionResponse(BaseModel):
+    session_id: str
+    display: str
+    leased_at: float
+    idle_seconds: float
+    in_flight: int
 
 class ScreenshotResponse(BaseModel):
     status: str
@@ -69,7 +186,22 @@ class ScreenshotResponse(BaseModel):
     timestamp: str
 
 # Helper functions
-def take_screenshot() -> str:
+capturers: Dict[str, ScreenCapturer] = {}
+
+def capturer_for(display: Optional[str] = None) -> ScreenCapturer:
+    """Capturer of a display; defaults to the one bound to the calling input worker"""
+    display = display or current_display() or DISPLAY
+    capturer = capturers.get(display)
+    if capturer is None:
+        capturer = capturers.setdefault(display, ScreenCapturer(display, SCREENSHOT_BACKEND, DISPLAY))
+    return capturer
+
+def clipboard():
+    """Clipboard of the calling input worker's display"""
+    display = current_display()
+    return DisplayClipboard(display) if display else pyperclip
+
+def take_screenshot(display: Optional[str] = None) -> str:
     """Take a screenshot and save it"""
     screenshots_dir = "/app/screenshots"
     os.makedirs(screenshots_dir, exist_ok=True)
@@ -79,14 +211,89 @@ def take_screenshot() -> str:
     filepath = os.path.join(screenshots_dir, filename)
 
     try:
-        screenshot = pyautogui.screenshot()
-        screenshot.save(filepath)
+        screenshot = capturer_for(display).image()
+        screenshot.save(filepath, compress_level=SCREENSHOT_COMPRESS_LEVEL)
         return filepath
     except Exception as e:
         print(f"Screenshot error: {e}")
         return None
 
-def execute_pyautogui_code(code: str) -> Dict[str, Any]:
+def capture_thumbnail() -> Image.Image:
+    """Cheap grayscale capture of the screen for change detection"""
+    with capturer_for().frame() as frame:
+        return frame.thumbnail(SETTLE_THUMBNAIL_SIZE)
+
+def frames_differ(previous: Image.Image, current: Image.Image) -> bool:
+    diff = ImageChops.difference(previous, current)
+    return ImageStat.Stat(diff).mean[0] > SETTLE_DIFF_THRESHOLD
+
+def wait_for_settle(timeout: Optional[float] = None, window: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Wait until the screen stops changing after an action
+    Returns settle_time (seconds until the last change) and whether the
+    screen settled before the timeout
+    """
+    timeout = SETTLE_TIMEOUT if timeout is None else timeout
+    window = SETTLE_WINDOW if window is None else window
+    if not SETTLE_ENABLED:
+        time.sleep(1)
+        return {"settle_time": None, "settled": None}
+
+    start_time = time.time()
+    previous = capture_thumbnail()
+    stable_since = time.time()
+    while True:
+        now = time.time()
+        if now - stable_since >= window:
+            return {"settle_time": stable_since - start_time, "settled": True}
+        if now - start_time >= timeout:
+            return {"settle_time": now - start_time, "settled": False}
+        time.sleep(SETTLE_INTERVAL)
+        current = capture_thumbnail()
+        if frames_differ(previous, current):
+            stable_since = time.time()
+        previous = current
+
+# pyautogui functions that sleep pyautogui.PAUSE after running (they take _pause)
+PAUSED_FUNCTIONS = {
+    "click", "doubleClick", "tripleClick", "rightClick", "middleClick", "leftClick",
+    "moveTo", "moveRel", "move", "dragTo", "dragRel", "drag", "mouseDown", "mouseUp",
+    "scroll", "hscroll", "vscroll", "press", "keyDown", "keyUp", "hotkey", "write", "typewrite"
+}
+
+class PausedPyAutoGUI:
+    """
+    pyautogui with the request's own pause: input calls skip the process-wide
+    pyautogui.PAUSE and sleep `pause` instead, so display workers running
+    requests with different timing profiles never share it
+    """
+
+    def __init__(self, pause: Optional[float] = None):
+        self.pause = pause
+
+    def __getattr__(self, name):
+        attr = getattr(pyautogui, name)
+        if name not in PAUSED_FUNCTIONS:
+            return attr
+        def call(*args, **kwargs):
+            kwargs["_pause"] = False
+            result = attr(*args, **kwargs)
+            time.sleep(pyautogui.PAUSE if self.pause is None else self.pause)
+            return result
+        return call
+
+def code_builtins(modules: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Builtins for exec'd code whose imports of the named modules return the
+    given objects, so the generated `import pyperclip` keeps the display's clipboard
+    """
+    def _import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0 and name in modules:
+            return modules[name]
+        return builtins.__import__(name, globals, locals, fromlist, level)
+    return {**vars(builtins), "__import__": _import}
+
+def execute_pyautogui_code(code: str, gui: Optional[PausedPyAutoGUI] = None) -> Dict[str, Any]:
     """
     Execute PyAutoGUI code safely
     """
@@ -98,12 +305,8 @@ def execute_pyautogui_code(code: str) -> Dict[str, Any]:
 
     try:
         # Create a safe execution environment
-        safe_globals = {
-            "pyautogui": pyautogui,
-            "pyperclip": pyperclip,
-            "time": time,
-            "__builtins__": __builtins__
-        }
+        modules = {"pyautogui": gui or PausedPyAutoGUI(), "pyperclip": clipboard(), "time": time}
+        safe_globals = {**modules, "__builtins__": code_builtins(modules)}
 
         # Execute the code
         exec(code, safe_globals)
@@ -117,20 +320,240 @@ def execute_pyautogui_code(code: str) -> Dict[str, Any]:
 
     return result
 
+# Structured action execution
+# Makes the same pyautogui calls as the code generated by ui_tars
+# parsing_response_to_pyautogui_code (tests check each built-in action), but
+# calls pyautogui directly instead of generating and exec'ing source. Key
+# tables come from ui_tars; action types registered there without a runner
+# here fall back to their generated code.
+
+class ActionContext:
+    """Screen size, input options and timing shared by the actions of one request"""
+
+    def __init__(self, image_width: int, image_height: int, input_swap: bool,
+                 timing: Optional[TimingProfile] = None):
+        self.image_width = image_width
+        self.image_height = image_height
+        self.input_swap = input_swap
+        self.timing = timing or get_timing_profile()
+        self.gui = PausedPyAutoGUI(self.timing.pause)
+
+    def to_screen(self, box: Any):
+        """Return the screen (x, y) of a normalized box center"""
+        if isinstance(box, str):
+            box = [float(num) for num in box.strip().strip("[]()").split(",")]
+        if len(box) == 4:
+            x1, y1, x2, y2 = box
+        else:
+            x1, y1 = box
+            x2, y2 = x1, y1
+        x = round(float((x1 + x2) / 2) * self.image_width, 3)
+        y = round(float((y1 + y2) / 2) * self.image_height, 3)
+        return x, y
+
+def _key_input(inputs: Dict[str, Any], fallback: str) -> str:
+    if "key" in inputs:
+        return inputs.get("key", "")
+    return inputs.get(fallback, "")
+
+def _run_hotkey(inputs: Dict[str, Any], ctx: ActionContext):
+    hotkey = _key_input(inputs, "hotkey")
+    if hotkey:
+        ctx.gui.hotkey(*[KEY_ALIASES.get(key, key) for key in hotkey.split()])
+
+def _run_key_down(inputs: Dict[str, Any], ctx: ActionContext):
+    key = _key_input(inputs, "press")
+    if key:
+        ctx.gui.keyDown(KEY_ALIASES.get(key, key))
+
+def _run_key_up(inputs: Dict[str, Any], ctx: ActionContext):
+    key = _key_input(inputs, "press")
+    if key:
+        ctx.gui.keyUp(KEY_ALIASES.get(key, key))
+
+def _run_type(inputs: Dict[str, Any], ctx: ActionContext):
+    content = inputs.get("content", "")
+    if not content:
+        return
+    submit = content.endswith("\n") or content.endswith("\\n")
+    text = content.rstrip("\\n").rstrip("\n") if submit else content
+    if ctx.input_swap:
+        clipboard().copy(text)
+        ctx.gui.hotkey("ctrl", "v")
+    else:
+        ctx.gui.write(text, interval=ctx.timing.write_interval)
+    time.sleep(ctx.timing.type_settle)
+    if submit:
+        ctx.gui.press("enter")
+
+def _run_drag(inputs: Dict[str, Any], ctx: ActionContext):
+    start_box = inputs.get("start_box")
+    end_box = inputs.get("end_box")
+    if start_box and end_box:
+        sx, sy = ctx.to_screen(start_box)
+        ex, ey = ctx.to_screen(end_box)
+        ctx.gui.moveTo(sx, sy)
+        ctx.gui.dragTo(ex, ey, duration=ctx.timing.drag_duration)
+
+def _run_scroll(inputs: Dict[str, Any], ctx: ActionContext):
+    direction = inputs.get("direction", "").lower()
+    if "up" in direction:
+        amount = 5
+    elif "down" in direction:
+        amount = -5
+    else:
+        return
+    start_box = inputs.get("start_box")
+    if start_box:
+        x, y = ctx.to_screen(start_box)
+        ctx.gui.scroll(amount, x=x, y=y)
+    else:
+        ctx.gui.scroll(amount)
+
+def _at_box(name: str, **kwargs):
+    """Bind a pyautogui function that takes the center of start_box"""
+    def run(inputs: Dict[str, Any], ctx: ActionContext):
+        start_box = inputs.get("start_box")
+        if start_box:
+            x, y = ctx.to_screen(start_box)
+            getattr(ctx.gui, name)(x, y, **kwargs)
+    return run
+
+def _run_long_press(inputs: Dict[str, Any], ctx: ActionContext):
+    start_box = inputs.get("start_box")
+    if start_box:
+        x, y = ctx.to_screen(start_box)
+        ctx.gui.mouseDown(x, y, button="left")
+        time.sleep(ctx.timing.long_press_duration)
+        ctx.gui.mouseUp(x, y, button="left")
+
+def _run_mobile_key(action_type: str):
+    def run(inputs: Dict[str, Any], ctx: ActionContext):
+        ctx.gui.press(MOBILE_KEYS[action_type])
+    return run
+
+def _run_open_app(inputs: Dict[str, Any], ctx: ActionContext):
+    app_name = inputs.get("app_name", "")
+    if app_name:
+        ctx.gui.press("win")
+        time.sleep(ctx.timing.launcher_delay)
+        ctx.gui.write(app_name)
+        ctx.gui.press("enter")
+
+def _run_noop(inputs: Dict[str, Any], ctx: ActionContext):
+    pass
+
+def _run_generated(action_type: str, inputs: Dict[str, Any], ctx: ActionContext):
+    """Run an action registered with ui_tars.register_action_handler through its generated code"""
+    code = parsing_response_to_pyautogui_code(
+        {"action_type": action_type, "action_inputs": inputs},
+        ctx.image_height, ctx.image_width, ctx.input_swap, timing=ctx.timing
+    )
+    result = execute_pyautogui_code(code, ctx.gui)
+    if not result["success"]:
+        raise RuntimeError(result["error"])
+
+ACTION_RUNNERS: Dict[str, Callable[[Dict[str, Any], ActionContext], None]] = {
+    "hotkey": _run_hotkey,
+    "press": _run_key_down,
+    "keydown": _run_key_down,
+    "release": _run_key_up,
+    "keyup": _run_key_up,
+    "type": _run_type,
+    "drag": _run_drag,
+    "select": _run_drag,
+    "scroll": _run_scroll,
+    "click": _at_box("click", button="left"),
+    "left_single": _at_box("click", button="left"),
+    "left_double": _at_box("doubleClick", button="left"),
+    "right_single": _at_box("click", button="right"),
+    "hover": _at_box("moveTo"),
+    "long_press": _run_long_press,
+    "press_home": _run_mobile_key("press_home"),
+    "press_back": _run_mobile_key("press_back"),
+    "open_app": _run_open_app,
+    "finished": _run_noop,
+    "wait": _run_noop,
+}
+
+def execute_structured_actions(actions: List[StructuredAction], ctx: ActionContext) -> List[ActionResult]:
+    """
+    Execute structured actions by dispatching to pre-bound pyautogui calls.
+    Stops at the first failing action, like exec() of the generated code.
+    """
+    results = []
+    for index, action in enumerate(actions):
+        if index > 0:
+            time.sleep(ctx.timing.action_interval)
+        start_time = time.time()
+        runner = ACTION_RUNNERS.get(action.action_type)
+        if runner is None and action.action_type not in registered_action_types():
+            results.append(ActionResult(
+                action_type=action.action_type,
+                status="skipped",
+                error=f"Unsupported action type: {action.action_type}",
+                execution_time=0.0
+            ))
+            continue
+        try:
+            if runner is None:
+                _run_generated(action.action_type, action.action_inputs, ctx)
+            else:
+                runner(action.action_inputs, ctx)
+            results.append(ActionResult(
+                action_type=action.action_type,
+                status="success",
+                execution_time=time.time() - start_time
+            ))
+        except Exception as e:
+            print(f"Execution error: {e}")
+            results.append(ActionResult(
+                action_type=action.action_type,
+                status="error",
+                error=str(e),
+                execution_time=time.time() - start_time
+            ))
+            break
+    return results
+
+def lease_for(session_id: Optional[str]) -> Optional[Lease]:
+    """The session's display lease, leasing a free display on first use"""
+    if session_id is None:
+        return None
+    if display_pool is None:
+        raise HTTPException(status_code=400, detail="Sessions need a display pool (DISPLAY_POOL_SIZE > 0)")
+    lease = display_pool.acquire(session_id)
+    if lease is None:
+        raise HTTPException(status_code=503, detail="No free display")
+    return lease
+
+async def run_input(lease: Optional[Lease], func: Callable, *args, **kwargs):
+    """
+    Run blocking input work on the leased display's worker, or the default display's
+    A leased display that went down ends its lease and answers 503; the session can lease again
+    """
+    if lease is None:
+        return await input_worker.run(func, *args, **kwargs)
+    try:
+        return await display_pool.run(lease, func, *args, **kwargs)
+    except DisplayUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"{e}; lease released")
+
 # API Endpoints
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     try:
         # Check if display is available
-        screen_size = pyautogui.size()
+        screen_size = await asyncio.to_thread(pyautogui.size)
 
         return {
             "status": "healthy",
             "service": "executor-service",
             "display": DISPLAY,
             "screen_size": {"width": screen_size[0], "height": screen_size[1]},
-            "redis": "connected" if redis_client else "disconnected"
+            "redis": "connected" if redis_client else "disconnected",
+            "input_worker": input_worker.metrics()
         }
     except Exception as e:
         return {
@@ -147,16 +570,54 @@ async def root():
         "status": "running"
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """Input worker queue depth and command counts, capture timings and display pool state"""
+    return {
+        "input_worker": input_worker.metrics(),
+        "capture": [capturer.metrics() for capturer in capturers.values()],
+        "display_pool": display_pool.metrics() if display_pool else None
+    }
+
+@app.post("/sessions", response_model=SessionResponse)
+async def create_session(request: SessionRequest = SessionRequest()):
+    """Lease a free display to a session (or return the session's current lease)"""
+    if display_pool is None:
+        raise HTTPException(status_code=400, detail="Sessions need a display pool (DISPLAY_POOL_SIZE > 0)")
+    lease = display_pool.acquire(request.session_id)
+    if lease is None:
+        raise HTTPException(status_code=503, detail="No free display")
+    return SessionResponse(**lease.info())
+
+@app.get("/sessions")
+async def list_sessions():
+    return display_pool.metrics() if display_pool else {"size": 0, "sessions": []}
+
+@app.delete("/sessions/{session_id}")
+async def release_session(session_id: str):
+    """Return a session's display to the pool"""
+    if display_pool is None or not display_pool.release(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"status": "released", "session_id": session_id}
+
 @app.post("/execute", response_model=ExecuteResponse)
 async def execute_action(request: ExecuteRequest):
     """
     Execute PyAutoGUI code
     """
+    lease = lease_for(request.session_id)
+    result = await run_input(lease, run_execute, request)
+    result.session_id = request.session_id
+    result.display = lease.display.name if lease else DISPLAY
+    return result
+
+def run_execute(request: ExecuteRequest) -> ExecuteResponse:
     execution_id = str(uuid.uuid4())
     start_time = time.time()
 
     screenshot_before_path = None
     screenshot_after_path = None
+    settle = {"settle_time": None, "settled": None}
 
     try:
         # Take screenshot before execution
@@ -164,11 +625,12 @@ async def execute_action(request: ExecuteRequest):
             screenshot_before_path = take_screenshot()
 
         # Execute the code
-        exec_result = execute_pyautogui_code(request.code)
+        gui = PausedPyAutoGUI(get_timing_profile(request.timing_profile).pause)
+        exec_result = execute_pyautogui_code(request.code, gui)
 
-        # Take screenshot after execution
+        # Take screenshot after execution, once the UI has finished updating
         if request.screenshot_after:
-            time.sleep(1)  # Wait for UI to update
+            settle = wait_for_settle(request.settle_timeout, request.settle_window)
             screenshot_after_path = take_screenshot()
 
         execution_time = time.time() - start_time
@@ -180,7 +642,8 @@ async def execute_action(request: ExecuteRequest):
                 message=exec_result["message"],
                 screenshot_before=screenshot_before_path,
                 screenshot_after=screenshot_after_path,
-                execution_time=execution_time
+                execution_time=execution_time,
+                **settle
             )
         else:
             return ExecuteResponse(
@@ -189,7 +652,8 @@ async def execute_action(request: ExecuteRequest):
                 error=exec_result["error"],
                 screenshot_before=screenshot_before_path,
                 screenshot_after=screenshot_after_path,
-                execution_time=execution_time
+                execution_time=execution_time,
+                **settle
             )
 
     except Exception as e:
@@ -201,13 +665,66 @@ async def execute_action(request: ExecuteRequest):
             execution_time=execution_time
         )
 
+@app.post("/execute/actions", response_model=ExecuteActionsResponse)
+async def execute_actions(request: ExecuteActionsRequest):
+    """
+    Execute structured actions directly, without generating or exec'ing code
+    """
+    lease = lease_for(request.session_id)
+    result = await run_input(lease, run_execute_actions, request)
+    result.session_id = request.session_id
+    result.display = lease.display.name if lease else DISPLAY
+    return result
+
+def run_execute_actions(request: ExecuteActionsRequest) -> ExecuteActionsResponse:
+    execution_id = str(uuid.uuid4())
+    start_time = time.time()
+
+    screenshot_before_path = None
+    screenshot_after_path = None
+    settle = {"settle_time": None, "settled": None}
+
+    try:
+        if request.screenshot_before:
+            screenshot_before_path = take_screenshot()
+
+        timing = get_timing_profile(request.timing_profile)
+        ctx = ActionContext(request.image_width, request.image_height, request.input_swap, timing)
+        results = execute_structured_actions(request.actions, ctx)
+
+        if request.screenshot_after:
+            settle = wait_for_settle(request.settle_timeout, request.settle_window)
+            screenshot_after_path = take_screenshot()
+
+        failed = next((r for r in results if r.status == "error"), None)
+        return ExecuteActionsResponse(
+            status="error" if failed else "success",
+            execution_id=execution_id,
+            results=results,
+            screenshot_before=screenshot_before_path,
+            screenshot_after=screenshot_after_path,
+            error=failed.error if failed else None,
+            execution_time=time.time() - start_time,
+            **settle
+        )
+
+    except Exception as e:
+        return ExecuteActionsResponse(
+            status="error",
+            execution_id=execution_id,
+            results=[],
+            error=str(e),
+            execution_time=time.time() - start_time
+        )
+
 @app.post("/screenshot", response_model=ScreenshotResponse)
-async def capture_screenshot():
+async def capture_screenshot(session_id: Optional[str] = None):
     """
-    Take a screenshot of the current display
+    Take a screenshot of the current display, or of a session's display
     """
+    lease = lease_for(session_id)
     try:
-        filepath = take_screenshot()
+        filepath = await asyncio.to_thread(take_screenshot, lease.display.name if lease else None)
 
         if filepath:
             return ScreenshotResponse(
@@ -225,8 +742,8 @@ async def capture_screenshot():
 async def get_screen_info():
     """Get screen information"""
     try:
-        screen_size = pyautogui.size()
-        mouse_position = pyautogui.position()
+        screen_size = await asyncio.to_thread(pyautogui.size)
+        mouse_position = await asyncio.to_thread(pyautogui.position)
 
         return {
             "screen_width": screen_size[0],
@@ -240,33 +757,43 @@ async def get_screen_info():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/mouse/move")
-async def move_mouse(x: int, y: int, duration: float = 0.5):
+async def move_mouse(x: int, y: int, duration: float = 0.5, session_id: Optional[str] = None):
     """Move mouse to coordinates"""
+    lease = lease_for(session_id)
     try:
-        pyautogui.moveTo(x, y, duration=duration)
+        await run_input(lease, pyautogui.moveTo, x, y, duration=duration)
         return {"status": "success", "x": x, "y": y}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/mouse/click")
-async def click_mouse(x: Optional[int] = None, y: Optional[int] = None, button: str = "left"):
+async def click_mouse(x: Optional[int] = None, y: Optional[int] = None, button: str = "left",
+                      session_id: Optional[str] = None):
     """Click mouse at coordinates"""
+    lease = lease_for(session_id)
     try:
         if x is not None and y is not None:
-            pyautogui.click(x, y, button=button)
+            await run_input(lease, pyautogui.click, x, y, button=button)
         else:
-            pyautogui.click(button=button)
+            await run_input(lease, pyautogui.click, button=button)
 
         return {"status": "success", "x": x, "y": y, "button": button}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/keyboard/type")
-async def type_text(text: str):
+async def type_text(text: str, session_id: Optional[str] = None):
     """Type text using pyautogui"""
+    lease = lease_for(session_id)
     try:
-        pyautogui.write(text)
+        await run_input(lease, pyautogui.write, text)
         return {"status": "success", "text": text}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
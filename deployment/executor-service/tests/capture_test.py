@@ -0,0 +1,105 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+import capture
+
+# no X server listens on this display, so the Xlib backends fail to open it
+MISSING_DISPLAY = ":987"
+
+
+def xlib_available():
+    try:
+        capture.load_xlib()
+    except OSError:
+        return False
+    return True
+
+
+def bgrx_frame(width, height, pad=0):
+    """Frame whose pixel (x, y) is RGB (x, y, 7), with `pad` bytes after each row"""
+    stride = width * 4 + pad
+    buffer = bytearray(stride * height)
+    for y in range(height):
+        for x in range(width):
+            offset = y * stride + x * 4
+            buffer[offset:offset + 4] = bytes((7, y, x, 0))
+    return capture.Frame(width, height, buffer, stride)
+
+
+class TestFrame(unittest.TestCase):
+
+    def test_image_from_bgrx_buffer(self):
+        frame = bgrx_frame(5, 3, pad=12)
+        image = frame.image()
+        self.assertEqual(image.mode, "RGB")
+        self.assertEqual(image.size, (5, 3))
+        self.assertEqual(image.getpixel((4, 2)), (4, 2, 7))
+        self.assertIs(frame.image(), image)
+
+    def test_thumbnail(self):
+        thumbnail = bgrx_frame(8, 4).thumbnail((2, 2))
+        self.assertEqual(thumbnail.mode, "L")
+        self.assertEqual(thumbnail.size, (2, 2))
+
+    def test_detach_copies_the_buffer(self):
+        frame = bgrx_frame(2, 2)
+        detached = frame.detach()
+        frame.buffer[:] = bytes(len(frame.buffer))
+        self.assertEqual(detached.image().getpixel((1, 1)), (1, 1, 7))
+
+    def test_detach_keeps_decoded_frames(self):
+        frame = capture.Frame.from_image(Image.new("RGB", (2, 2)))
+        self.assertIs(frame.detach(), frame)
+
+
+@unittest.skipUnless(xlib_available(), "libX11/libXext not installed")
+class TestBackendFallback(unittest.TestCase):
+
+    def test_xlib_backends_fail_cleanly_without_a_display(self):
+        for name in ("xshm", "xgetimage"):
+            with self.assertRaisesRegex(RuntimeError, "Cannot open display"):
+                capture.create_backend(name, MISSING_DISPLAY)
+
+    def test_auto_falls_back_past_xshm(self):
+        screen = Image.new("RGB", (4, 3), (1, 2, 3))
+        with mock.patch.object(capture.ImageGrab, "grab", return_value=screen):
+            backend = capture.create_backend("auto", MISSING_DISPLAY, ":0")
+        self.assertEqual(backend.name, "imagegrab")
+        self.assertEqual(backend.display_name, MISSING_DISPLAY)
+
+    def test_auto_without_working_backend(self):
+        with mock.patch.object(capture.ImageGrab, "grab", side_effect=OSError("no display")):
+            with self.assertRaisesRegex(RuntimeError, "No screenshot backend"):
+                capture.create_backend("auto", MISSING_DISPLAY, ":0")
+
+
+class TestScreenCapturer(unittest.TestCase):
+
+    def test_reopens_backend_after_failure(self):
+        broken, working = mock.Mock(), mock.Mock()
+        broken.grab.side_effect = RuntimeError("Lost connection to display :1")
+        working.grab.return_value = bgrx_frame(2, 2)
+        working.name = "xgetimage"
+        capturer = capture.ScreenCapturer(":1")
+
+        with mock.patch.object(capture, "create_backend", side_effect=[broken, working]):
+            with self.assertRaises(RuntimeError):
+                capturer.image()
+            broken.close.assert_called_once()
+            self.assertIsNone(capturer.backend)
+            self.assertEqual(capturer.image().size, (2, 2))
+
+        metrics = capturer.metrics()
+        self.assertEqual(metrics["backend"], "xgetimage")
+        self.assertEqual(metrics["captures"], 1)
+        self.assertEqual(metrics["failures"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
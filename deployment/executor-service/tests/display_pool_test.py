@@ -0,0 +1,143 @@
+import os
+import sys
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import display_pool
+from display_pool import DisplayPool, DisplayUnavailable, InputWorker, ThreadDisplayProxy, VirtualDisplay
+
+
+def failing_bind(display):
+    display_pool._thread_display.pooled = True
+    display_pool._thread_display.name = display
+    raise OSError("connection refused")
+
+
+def started_worker(test, **kwargs):
+    worker = InputWorker(":1", **kwargs)
+    worker.start(timeout=5)
+    test.addCleanup(worker.stop, 5)
+    return worker
+
+
+class TestInputWorker(unittest.TestCase):
+
+    def test_failed_bind_fails_every_command(self):
+        with mock.patch.object(display_pool, "bind_thread_display", failing_bind):
+            worker = started_worker(self, bind=True)
+        self.assertFalse(worker.usable)
+        self.assertIn("connection refused", worker.bind_error)
+        with self.assertRaises(DisplayUnavailable):
+            worker.submit(lambda: "ran").result(timeout=5)
+
+    def test_pooled_thread_never_uses_the_default_connection(self):
+        proxy = ThreadDisplayProxy(default=mock.Mock())
+        with mock.patch.object(display_pool, "bind_thread_display", failing_bind):
+            worker = started_worker(self, bind=True)
+        worker.bind_error = None  # let the command reach the proxy
+        with self.assertRaises(DisplayUnavailable):
+            worker.submit(lambda: proxy.screen).result(timeout=5)
+        proxy._default.screen.assert_not_called()
+
+    def test_stop_fails_queued_commands(self):
+        worker = InputWorker(":1")
+        worker.start(timeout=5)
+        release = threading.Event()
+        running = worker.submit(release.wait, 5)
+        queued = worker.submit(lambda: "ran")
+        while worker.running is None:
+            release.wait(0.01)
+
+        stopper = threading.Thread(target=worker.stop, args=(5,))
+        stopper.start()
+        with self.assertRaises(DisplayUnavailable):
+            queued.result(timeout=5)
+        release.set()
+        stopper.join(5)
+
+        self.assertTrue(running.result(timeout=5))
+        with self.assertRaises(DisplayUnavailable):
+            worker.submit(lambda: "ran")
+
+
+class TestVirtualDisplay(unittest.TestCase):
+
+    def setUp(self):
+        self.display = VirtualDisplay(7651, "64x64x24", None, start_timeout=1)
+        self.addCleanup(self.remove, self.display.lock_path)
+        self.addCleanup(self.remove, self.display.socket_path)
+
+    def remove(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write_lock(self, pid):
+        os.makedirs(os.path.dirname(self.display.socket_path), exist_ok=True)
+        with open(self.display.lock_path, "w") as f:
+            f.write(f"{pid:>10}\n")
+        open(self.display.socket_path, "w").close()
+
+    def test_clears_files_of_a_crashed_server(self):
+        self.write_lock(2 ** 22 + 1)  # above pid_max, never a live process
+        self.display._clear_stale_server()
+        self.assertFalse(os.path.exists(self.display.lock_path))
+        self.assertFalse(os.path.exists(self.display.socket_path))
+
+    def test_keeps_files_of_a_running_server(self):
+        self.write_lock(os.getpid())
+        with self.assertRaisesRegex(RuntimeError, "in use"):
+            self.display._clear_stale_server()
+        self.assertTrue(os.path.exists(self.display.socket_path))
+
+    def test_stale_socket_is_not_listening(self):
+        self.write_lock(2 ** 22 + 1)
+        self.assertFalse(self.display._listening())
+
+    def test_failed_restart_leaves_no_worker(self):
+        old_worker = mock.Mock()
+        self.display.worker = old_worker
+        with mock.patch.object(VirtualDisplay, "_start_server", side_effect=RuntimeError("Xvfb :7651 failed to start")):
+            with self.assertRaises(RuntimeError):
+                self.display.restart()
+        self.assertIsNone(self.display.worker)
+        old_worker.stop.assert_called_once()
+        self.assertEqual(self.display.restarts, 1)
+
+
+class TestDisplayPool(unittest.TestCase):
+
+    def make_pool(self):
+        pool = DisplayPool(2, 7660, "64x64x24", None, idle_timeout=60)
+        for display in pool.displays:
+            display.usable = mock.Mock(return_value=True)
+        return pool
+
+    def test_refuses_to_start_without_display_proxy(self):
+        pool = self.make_pool()
+        with mock.patch.object(display_pool, "install_display_proxy", return_value=False):
+            with self.assertRaisesRegex(RuntimeError, "no X11 backend"):
+                pool.start()
+
+    def test_acquire_skips_unusable_displays(self):
+        pool = self.make_pool()
+        pool.displays[0].usable.return_value = False
+        lease = pool.acquire("a")
+        self.assertEqual(lease.display.name, ":7661")
+        self.assertIsNone(pool.acquire("b"))
+
+    def test_run_on_a_down_display_ends_the_lease(self):
+        pool = self.make_pool()
+        lease = pool.acquire("a")
+        lease.display.worker = None
+        with self.assertRaises(DisplayUnavailable):
+            asyncio.run(pool.run(lease, lambda: "ran"))
+        self.assertNotIn("a", pool.leases)
+        self.assertEqual(lease.in_flight, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
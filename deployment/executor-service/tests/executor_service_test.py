@@ -0,0 +1,226 @@
+import os
+import sys
+import asyncio
+import unittest
+from unittest import mock
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+sys.path.insert(0, os.path.join(SERVICE_DIR, "..", "..", "codes"))
+
+from ui_tars import action_parser
+from ui_tars.action_parser import (
+    parse_action_to_structure_output,
+    parsing_response_to_pyautogui_code,
+    register_action_handler,
+    registered_action_types,
+)
+
+# pyautogui connects to an X display on import; the tests only check what
+# the executor asks it (and the clipboard) to do
+with mock.patch.dict(sys.modules, {
+        "pyautogui": mock.MagicMock(PAUSE=0.5),
+        "pyperclip": mock.MagicMock()
+}):
+    import display_pool
+    import executor_service
+
+
+def type_code(content):
+    actions = parse_action_to_structure_output(
+        f"Thought: type it\nAction: type(content='{content}')", 1000, 1080,
+        1920)
+    return parsing_response_to_pyautogui_code(actions, 1080, 1920, True,
+                                              timing="zero")
+
+
+class TestExecutePyautoguiCode(unittest.TestCase):
+
+    def setUp(self):
+        executor_service.pyautogui.reset_mock()
+        executor_service.pyperclip.reset_mock()
+
+    def bind_display(self, display):
+        display_pool._thread_display.name = display
+        self.addCleanup(delattr, display_pool._thread_display, "name")
+
+    def test_type_on_leased_display_uses_its_clipboard(self):
+        self.bind_display(":101")
+        with mock.patch.object(display_pool.DisplayClipboard, "copy",
+                               autospec=True) as copy:
+            result = executor_service.execute_pyautogui_code(
+                type_code("hello"), executor_service.PausedPyAutoGUI(0))
+
+        self.assertTrue(result["success"], result["error"])
+        copy.assert_called_once()
+        clipboard, text = copy.call_args.args
+        self.assertEqual(clipboard.env["DISPLAY"], ":101")
+        self.assertEqual(text, "hello")
+        executor_service.pyperclip.copy.assert_not_called()
+        executor_service.pyautogui.hotkey.assert_called_with("ctrl", "v",
+                                                             _pause=False)
+
+    def test_type_on_default_display_uses_pyperclip(self):
+        result = executor_service.execute_pyautogui_code(
+            type_code("hello"), executor_service.PausedPyAutoGUI(0))
+
+        self.assertTrue(result["success"], result["error"])
+        executor_service.pyperclip.copy.assert_called_once_with("hello")
+
+    def test_other_imports_still_work(self):
+        result = executor_service.execute_pyautogui_code(
+            "import json\nassert json.loads('[1]') == [1]")
+        self.assertTrue(result["success"], result["error"])
+
+
+class TestRequestPause(unittest.TestCase):
+
+    def setUp(self):
+        executor_service.pyautogui.reset_mock()
+        self.sleep = mock.patch.object(executor_service.time, "sleep").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_pause_is_per_request(self):
+        fast = executor_service.PausedPyAutoGUI(0.05)
+        default = executor_service.PausedPyAutoGUI()
+
+        fast.click(1, 2)
+        default.press("a")
+
+        executor_service.pyautogui.click.assert_called_once_with(1, 2,
+                                                                 _pause=False)
+        self.assertEqual(self.sleep.call_args_list,
+                         [mock.call(0.05), mock.call(0.5)])
+        self.assertEqual(executor_service.pyautogui.PAUSE, 0.5)
+
+    def test_execute_uses_profile_pause(self):
+        request = executor_service.ExecuteRequest(code="pyautogui.click(1, 2)",
+                                                  screenshot_after=False,
+                                                  timing_profile="fast")
+        result = executor_service.run_execute(request)
+
+        self.assertEqual(result.status, "success")
+        self.sleep.assert_called_once_with(0.05)
+        self.assertEqual(executor_service.pyautogui.PAUSE, 0.5)
+
+    def test_structured_actions_use_profile_pause(self):
+        request = executor_service.ExecuteActionsRequest(
+            actions=[{
+                "action_type": "click",
+                "action_inputs": {"start_box": [0.5, 0.5]}
+            }],
+            screenshot_after=False,
+            timing_profile="zero")
+        result = executor_service.run_execute_actions(request)
+
+        self.assertEqual(result.status, "success")
+        executor_service.pyautogui.click.assert_called_once_with(
+            960.0, 540.0, button="left", _pause=False)
+        self.sleep.assert_called_once_with(0.0)
+
+
+# one sample input per built-in action type
+SAMPLE_INPUTS = {
+    "hotkey": {"key": "ctrl arrowleft"},
+    "press": {"key": "space"},
+    "keydown": {"press": "a"},
+    "release": {"key": "arrowup"},
+    "keyup": {"press": "a"},
+    "type": {"content": "hi\\n"},
+    "drag": {"start_box": "[0.1, 0.2, 0.1, 0.2]", "end_box": "[0.5, 0.6, 0.5, 0.6]"},
+    "select": {"start_box": "[0.1, 0.2, 0.3, 0.4]", "end_box": "[0.5, 0.6, 0.7, 0.8]"},
+    "scroll": {"direction": "down", "start_box": "[0.25, 0.5, 0.25, 0.5]"},
+    "click": {"start_box": "[0.5, 0.5, 0.5, 0.5]"},
+    "left_single": {"start_box": "[0.1, 0.1, 0.1, 0.1]"},
+    "left_double": {"start_box": "[0.2, 0.2, 0.2, 0.2]"},
+    "right_single": {"start_box": "[0.3, 0.3, 0.3, 0.3]"},
+    "hover": {"start_box": "[0.4, 0.4, 0.4, 0.4]"},
+    "long_press": {"start_box": "[0.6, 0.6, 0.6, 0.6]"},
+    "press_home": {},
+    "press_back": {},
+    "open_app": {"app_name": "calculator"},
+}
+
+
+class TestStructuredMatchesGeneratedCode(unittest.TestCase):
+
+    def setUp(self):
+        self.sleep = mock.patch.object(executor_service.time, "sleep").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def calls(self, run):
+        executor_service.pyautogui.reset_mock()
+        executor_service.pyperclip.reset_mock()
+        self.sleep.reset_mock()
+        run()
+        return (executor_service.pyautogui.mock_calls,
+                executor_service.pyperclip.mock_calls,
+                self.sleep.call_args_list)
+
+    def run_both(self, action_type, inputs, input_swap=True):
+        action = {"action_type": action_type, "action_inputs": inputs}
+
+        def structured():
+            ctx = executor_service.ActionContext(1920, 1080, input_swap)
+            results = executor_service.execute_structured_actions(
+                [executor_service.StructuredAction(**action)], ctx)
+            self.assertEqual(results[0].status, "success", results[0].error)
+
+        def generated():
+            code = parsing_response_to_pyautogui_code(action, 1080, 1920, input_swap)
+            result = executor_service.execute_pyautogui_code(code, executor_service.PausedPyAutoGUI())
+            self.assertTrue(result["success"], result["error"])
+
+        return self.calls(structured), self.calls(generated)
+
+    def test_every_builtin_action_has_a_sample(self):
+        self.assertEqual(set(SAMPLE_INPUTS), registered_action_types() - {"finished"})
+
+    def test_builtin_actions_make_the_same_calls(self):
+        for action_type, inputs in SAMPLE_INPUTS.items():
+            for input_swap in (True, False):
+                with self.subTest(action_type=action_type, input_swap=input_swap):
+                    structured, generated = self.run_both(action_type, inputs, input_swap)
+                    self.assertTrue(structured[0], "no pyautogui calls")
+                    self.assertEqual(structured, generated)
+
+    def test_registered_action_runs_through_generated_code(self):
+        handlers = dict(action_parser._ACTION_HANDLERS)
+        self.addCleanup(action_parser._ACTION_HANDLERS.update, handlers)
+        self.addCleanup(action_parser._ACTION_HANDLERS.clear)
+
+        @register_action_handler("triple_click")
+        def _triple_click(parts, action_type, action_inputs, context):
+            x, y = context.to_screen(action_inputs["start_box"])
+            parts.append(f"\npyautogui.tripleClick({x}, {y})")
+
+        structured, generated = self.run_both("triple_click", {"start_box": "[0.5, 0.5, 0.5, 0.5]"})
+        self.assertIn(mock.call.tripleClick(960.0, 540.0, _pause=False), structured[0])
+        self.assertEqual(structured, generated)
+
+    def test_unsupported_action_type(self):
+        ctx = executor_service.ActionContext(1920, 1080, True)
+        results = executor_service.execute_structured_actions(
+            [executor_service.StructuredAction(action_type="teleport")], ctx)
+        self.assertEqual(results[0].status, "skipped")
+        self.assertEqual(results[0].error, "Unsupported action type: teleport")
+
+
+class TestLeasedDisplayDown(unittest.TestCase):
+
+    def test_down_display_answers_503_and_releases_the_lease(self):
+        pool = display_pool.DisplayPool(1, 7670, "64x64x24", None, idle_timeout=60)
+        pool.displays[0].usable = mock.Mock(return_value=True)
+        lease = pool.acquire("session")
+        lease.display.worker = None
+
+        with mock.patch.object(executor_service, "display_pool", pool):
+            with self.assertRaises(executor_service.HTTPException) as raised:
+                asyncio.run(executor_service.run_input(lease, lambda: "ran"))
+
+        self.assertEqual(raised.exception.status_code, 503)
+        self.assertEqual(pool.leases, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,13 +2,21 @@
 Mock Model Service for Testing
 Simulates UI-TARS model responses without GPU requirements
 """
+import os
+import re
+import json
 import time
 import random
+import asyncio
 from typing import Optional, List, Dict, Any
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
+# Delay between streamed tokens, in seconds
+MOCK_TOKEN_DELAY = float(os.getenv("MOCK_TOKEN_DELAY", "0.02"))
+
 app = FastAPI(
     title="UI-TARS Mock Model Service",
     description="Mock service for testing without GPU",
@@ -120,6 +128,47 @@ async def generate(request: GenerateRequest):
         processing_time=processing_time
     )
 
+@app.post("/generate_stream")
+async def generate_stream(request: GenerateRequest):
+    """
+    Stream a mock model response token by token as Server-Sent Events
+    Events follow TGI's /generate_stream: one `token` per event, and the
+    full `generated_text` on the last one
+    """
+    output = generate_mock_response(request.task)
+    tokens = re.findall(r"\S+\s*|\s+", output)
+
+    async def events():
+        for i, token in enumerate(tokens):
+            await asyncio.sleep(MOCK_TOKEN_DELAY)
+            event = {
+                "token": {"id": i, "text": token},
+                "generated_text": output if i == len(tokens) - 1 else None
+            }
+            yield f"data: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/generate/upload", response_model=GenerateResponse)
+async def generate_upload(
+    image: UploadFile = File(...),
+    task: str = Form(...),
+    model_type: str = Form("qwen25vl"),
+    max_tokens: int = Form(400),
+    temperature: float = Form(0.0)
+):
+    """
+    Generate mock model response for a multipart screenshot upload
+    Same contract as /generate, with the image as raw bytes instead of base64
+    """
+    await image.read()
+    return await generate(GenerateRequest(
+        task=task,
+        model_type=model_type,
+        max_tokens=max_tokens,
+        temperature=temperature
+    ))
+
 @app.get("/info")
 async def get_info():
     """Get model information"""
@@ -140,6 +189,5 @@ async def get_info():
 
 if __name__ == "__main__":
     import uvicorn
-    import os
     port = int(os.getenv("PORT", 8081))
     uvicorn.run(app, host="0.0.0.0", port=port)
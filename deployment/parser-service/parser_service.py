@@ -4,7 +4,7 @@ Handles parsing of LLM outputs and PyAutoGUI code generation
 """
 import os
 import json
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Union
 
 import httpx
 import redis
@@ -56,6 +56,9 @@ class ParseRequest(BaseModel):
     image_width: int = Field(1920, description="Target screen width")
     max_pixels: int = Field(16384 * 28 * 28, description="Max pixels")
     min_pixels: int = Field(100 * 28 * 28, description="Min pixels")
+    timing_profile: Optional[Union[str, Dict[str, Any]]] = Field(
+        None, description="Timing profile name or overrides for the generated code"
+    )
 
 class ParseResponse(BaseModel):
     status: str
@@ -68,6 +71,10 @@ class ParseResponse(BaseModel):
 
 class ExecuteRequest(BaseModel):
     pyautogui_code: str = Field(..., description="PyAutoGUI code to execute")
+    timing_profile: Optional[Union[str, Dict[str, Any]]] = Field(
+        None, description="Timing profile whose pause the executor applies"
+    )
+    session_id: Optional[str] = Field(None, description="Executor session (leased display) to run on")
 
 class ExecuteResponse(BaseModel):
     status: str
@@ -124,7 +131,8 @@ async def parse_action(request: ParseRequest):
             responses=structured_output,
             image_height=request.image_height,
             image_width=request.image_width,
-            input_swap=True
+            input_swap=True,
+            timing=request.timing_profile
         )
 
         return ParseResponse(
@@ -151,7 +159,11 @@ async def execute_action(request: ExecuteRequest):
         async with httpx.AsyncClient(timeout=60.0) as client:
             response = await client.post(
                 f"{EXECUTOR_SERVICE_URL}/execute",
-                json={"code": request.pyautogui_code}
+                json={
+                    "code": request.pyautogui_code,
+                    "timing_profile": request.timing_profile,
+                    "session_id": request.session_id
+                }
             )
             response.raise_for_status()
             result = response.json()
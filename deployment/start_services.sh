@@ -21,7 +21,11 @@ echo -e "${BLUE}╚════════════════════
 echo -e "${YELLOW}Checking Python packages...${NC}"
 python3 -c "import fastapi, uvicorn, pydantic, httpx" 2>/dev/null || {
     echo -e "${RED}✗ Missing packages. Installing...${NC}"
-    pip install -q fastapi uvicorn[standard] pydantic httpx ui-tars redis
+    pip install -q fastapi uvicorn[standard] pydantic httpx redis
+}
+python3 -c "from ui_tars.action_parser import StreamingActionParser" 2>/dev/null || {
+    echo -e "${YELLOW}Installing ui-tars from ../codes...${NC}"
+    pip install -q ../codes
 }
 echo -e "${GREEN}✓ All packages available${NC}\n"
 